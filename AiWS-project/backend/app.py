@@ -1,27 +1,191 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import and_, event, func, or_
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 import boto3
+import base64
+import gzip
+import hashlib
+import multiprocessing
 import json
+import logging
+import math
+import os
+import random
+import subprocess
+import threading
+import unicodedata
+import uuid
+import time
 import regex as re
+from urllib.parse import parse_qs, urlsplit
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+try:
+    import orjson  # Optional faster encoder for stored learning paths
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard  # Optional, only needed for STORAGE_CONTENT_ENCODING = 'zstd'
+except ImportError:
+    zstandard = None
+
 # Initialize the Flask app
 app = Flask(__name__)
 # Configure CORS to allow requests from your React app
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:5173"}})
 
-# SQLite database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
+# Database configuration: the bundled SQLite file unless DATABASE_URL points at another SQLAlchemy URL
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///users.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['DB_POOL_SIZE'] = 10  # Pooled connections for server databases
+app.config['DB_MAX_OVERFLOW'] = 20  # Extra connections allowed above the pool size under bursts
+app.config['DB_POOL_TIMEOUT'] = 30  # Seconds to wait for a free connection
+app.config['DB_POOL_RECYCLE'] = 1800  # Seconds before a connection is replaced, to dodge server-side idle timeouts
+app.config['SQLITE_BUSY_TIMEOUT'] = 5000  # Milliseconds a SQLite writer waits for the lock instead of failing
 app.config['SECRET_KEY'] = '1242421332'  # Change this to a secure random key in production
 app.config['CORS_HEADERS'] = 'Content-Type'
+app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000000'  # Stored hashes using other parameters are upgraded on login
+app.config['PASSWORD_SALT_LENGTH'] = 16
+app.config['PASSWORD_HASH_WORKERS'] = min(4, os.cpu_count() or 1)  # Processes dedicated to password hashing
+app.config['FEED_PAGE_SIZE'] = 20  # Default page size for activity and achievement feeds
+app.config['FEED_MAX_PAGE_SIZE'] = 100
+
+# Learning path generation configuration
+app.config['ENRICHMENT_MAX_WORKERS'] = 4  # Max concurrent topic enrichment calls per learning path
+app.config['ENRICHMENT_TIMEOUT'] = 30  # Seconds a single topic call may run before its defaults are used
+app.config['ENRICHMENT_RETRIES'] = 1  # Re-requests for a topic whose answer failed or did not validate
+app.config['ENRICHMENT_MODE'] = 'per_topic'  # 'per_topic' (one call per topic) or 'batched' (one call for all topics)
+app.config['BEDROCK_STREAMING'] = False  # Stream the basic path and start enriching topics as they arrive
+app.config['JOB_WORKERS'] = 4  # Learning path jobs generated at the same time
+app.config['JOB_STALE_AFTER'] = 10 * 60  # Seconds without progress before a running job is considered abandoned
+
+# AWS client configuration (shared by every Bedrock and Lambda call)
+app.config['AWS_MAX_POOL_CONNECTIONS'] = 20  # HTTP connections kept open per client
+app.config['AWS_MAX_RETRIES'] = 3
+app.config['AWS_RETRY_MODE'] = 'adaptive'  # 'legacy', 'standard' or 'adaptive' (client-side backoff on throttling)
+app.config['AWS_CONNECT_TIMEOUT'] = 5
+app.config['AWS_READ_TIMEOUT'] = 60
+app.config['AWS_TCP_KEEPALIVE'] = True
+
+# Client-side Bedrock rate limits per model ID: sustained requests per second and burst size.
+# Models without an entry are not limited.
+app.config['BEDROCK_RATE_LIMITS'] = {
+    "anthropic.claude-3-haiku-20240307-v1:0": {"rate": 5, "burst": 10}
+}
+app.config['BEDROCK_RATE_LIMIT_MAX_WAIT'] = 10  # Seconds a call may queue for a token before it is rejected
+app.config['SINGLE_FLIGHT_MAX_WAIT'] = 120  # Seconds to wait for an identical in-flight generation before starting our own
+
+# Prompt budgeting
+app.config['PROMPT_VARIANT'] = 'compact'  # 'compact' or 'verbose' system prompts; part of every cache key
+app.config['ADAPTIVE_MAX_TOKENS'] = True  # Size max_tokens from the output lengths observed per template
+app.config['MAX_TOKENS_DEFAULTS'] = {  # Budgets until enough outputs are observed; enrich_batch is per topic
+    "basic_path": 1000,
+    "enrich_topic": 1000,
+    "enrich_batch": 1000,
+    "json_repair": 500
+}
+app.config['MAX_TOKENS_CEILING'] = 4096  # Upper bound for any request, including truncation retries
+app.config['MAX_TOKENS_HEADROOM'] = 1.3  # Multiplier over the 99th percentile of observed outputs
+app.config['MAX_TOKENS_MIN_SAMPLES'] = 20  # Outputs per template before its budget adapts
+app.config['MAX_TOKENS_WINDOW'] = 500  # Most recent outputs per template that the budget is based on
+
+# Response cache for generated learning paths
+app.config['PATH_CACHE_SIZE'] = 256  # Entries kept in memory
+app.config['PATH_CACHE_TTL'] = 24 * 60 * 60  # Seconds before a cached path is regenerated
+app.config['PATH_CACHE_PERSIST'] = True  # Also keep cached paths in the database so restarts start warm
+app.config['TOPIC_CACHE_SIZE'] = 2048  # Enriched topics kept in memory, shared across learning paths
+app.config['TOPIC_CACHE_TTL'] = 7 * 24 * 60 * 60
+app.config['FLOWCHART_FRAGMENT_CACHE_SIZE'] = 8192  # Memoized per-topic Mermaid fragments
+
+# Optional server-side rendering of roadmap flowcharts to SVG
+app.config['FLOWCHART_SVG_RENDERING'] = False  # Needs the Mermaid CLI: npm install -g @mermaid-js/mermaid-cli
+app.config['FLOWCHART_RENDERER'] = 'mmdc'  # Mermaid CLI executable
+app.config['FLOWCHART_RENDER_TIMEOUT'] = 60  # Seconds before a render is abandoned
+app.config['FLOWCHART_RENDER_WORKERS'] = 2  # Renders running at once; each starts a headless browser, so keep this small
+app.config['FLOWCHART_SVG_CACHE_SIZE'] = 256  # Rendered SVGs kept in memory
+app.config['FLOWCHART_SVG_DIR'] = os.path.join(app.instance_path, 'flowcharts')
+app.config['FLOWCHART_SVG_DIR_MAX_ENTRIES'] = 10000  # Flowcharts kept on disk; the least recently generated are deleted
+
+# Observability
+app.config['DEBUG_LOG_SAMPLE_RATE'] = 0.01  # Fraction of raw model responses and flowcharts logged at DEBUG level
+
+ENRICHMENT_MODES = ('per_topic', 'batched')
+BEDROCK_MODEL_ID = "anthropic.claude-3-haiku-20240307-v1:0"
+# Bump whenever a generation prompt changes so cached output from old prompts is not reused
+PROMPT_TEMPLATE_VERSION = "1"
+BEDROCK_REGION = "us-east-1"
+LAMBDA_REGION = "ap-southeast-2"
+
+# Learning path storage
+app.config['STORAGE_BACKEND'] = 'lambda'  # 'lambda' (via aiws-lambda), 's3' (direct put_object) or 'local' (filesystem)
+app.config['STORAGE_WRITE_MODE'] = 'sync'  # 'sync', 'async' (fire-and-forget) or 'batched'
+app.config['STORAGE_BUCKET'] = 'aiws-challange-bucket'
+app.config['STORAGE_S3_REGION'] = LAMBDA_REGION
+app.config['STORAGE_LOCAL_DIR'] = os.path.join(app.instance_path, 'learning-paths')
+app.config['STORAGE_WRITE_WORKERS'] = 8  # Threads for background and batched writes
+app.config['STORAGE_BATCH_SIZE'] = 25  # Batched mode: write as soon as this many saves are waiting
+app.config['STORAGE_BATCH_INTERVAL'] = 0.5  # Batched mode: or this many seconds after the first one arrived
+app.config['STORAGE_CONTENT_ENCODING'] = 'gzip'  # 'gzip', 'zstd' (needs zstandard) or 'identity' for stored objects
+app.config['STORAGE_JSON_INDENT'] = None  # Indent width for pretty-printed stored JSON; None writes compact JSON
+
+def database_engine_options(database_uri):
+    """Engine options suited to the configured database backend"""
+    if make_url(database_uri).get_backend_name() == 'sqlite':
+        # SQLite has a single writer, so a large pool only adds lock contention
+        return {
+            "connect_args": {"check_same_thread": False, "timeout": app.config['SQLITE_BUSY_TIMEOUT'] / 1000},
+        }
+    return {
+        "pool_size": app.config['DB_POOL_SIZE'],
+        "max_overflow": app.config['DB_MAX_OVERFLOW'],
+        "pool_timeout": app.config['DB_POOL_TIMEOUT'],
+        "pool_recycle": app.config['DB_POOL_RECYCLE'],
+        "pool_pre_ping": True,
+    }
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 
 # Initialize SQLAlchemy
 db = SQLAlchemy(app)
 
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    """Let readers proceed during writes and make writers queue for the lock instead of erroring"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT'])}")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL; only the last commits can be lost on power failure
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")  # 16 MB page cache per connection
+    cursor.close()
+
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', configure_sqlite_connection)
+
+def get_database_pool_stats():
+    """Connection pool usage for the database engine"""
+    with app.app_context():
+        engine = db.engine
+    pool = engine.pool
+    stats = {"backend": engine.dialect.name, "pool": type(pool).__name__}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    return stats
+
 # User model
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -63,6 +227,11 @@ class Achievement(db.Model):
     description = db.Column(db.Text)
     icon = db.Column(db.String(50), default='🏆')
     earned_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Backs the per-user achievement feed, newest first, with id as the tie-breaker
+    __table_args__ = (
+        db.Index('ix_achievement_user_earned', 'user_id', 'earned_at', 'id'),
+    )
 
 class UserActivity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -70,11 +239,94 @@ class UserActivity(db.Model):
     activity_type = db.Column(db.String(50), nullable=False)
     details = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Backs the per-profile activity feed, newest first, with id as the tie-breaker
+    __table_args__ = (
+        db.Index('ix_user_activity_profile_created', 'user_profile_id', 'created_at', 'id'),
+    )
+
+class CachedLearningPath(db.Model):
+    key = db.Column(db.String(64), primary_key=True)
+    prompt = db.Column(db.Text, nullable=False)
+    learning_path = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class LearningPathJob(db.Model):
+    id = db.Column(db.String(36), primary_key=True)
+    prompt = db.Column(db.Text, nullable=False)
+    enrichment_mode = db.Column(db.String(20), nullable=False, default='per_topic')
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, succeeded, failed
+    stage = db.Column(db.String(20), nullable=False, default='queued')  # queued, basic_path, enrichment, validation, done
+    topics_total = db.Column(db.Integer, nullable=False, default=0)
+    topics_done = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class LearningPathIndex(db.Model):
+    """One row per stored learning path, so history views never list or read the stored objects"""
+    id = db.Column(db.Integer, primary_key=True)
+    path_id = db.Column(db.String(36), unique=True, nullable=False)
+    user_id = db.Column(db.String(255), nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+    topic_count = db.Column(db.Integer, nullable=False, default=0)
+    size_bytes = db.Column(db.Integer)  # Stored object size, after compression
+    storage_location = db.Column(db.String(512), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # Backs the per-user history listing, newest first, with id as the tie-breaker
+    __table_args__ = (
+        db.Index('ix_learning_path_index_user_created', 'user_id', 'created_at', 'id'),
+    )
 
 # Create tables in a function that we'll call after defining the app
 def create_tables():
     with app.app_context():
         db.create_all()
+        # create_all skips tables that already exist, so add indexes introduced since they were created
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+
+# Password hashing is deliberately CPU-heavy, so it runs in a separate process pool;
+# request threads only wait on the result and do not hold the GIL while they do.
+# The pool is created on first use, when the server is already running threads, so
+# its workers come from a forkserver rather than a fork of this threaded process.
+password_hash_executor = None
+password_hash_executor_lock = threading.Lock()
+
+def run_password_task(fn, *args):
+    """Run a werkzeug hashing function in the password process pool"""
+    global password_hash_executor
+    if password_hash_executor is None:
+        with password_hash_executor_lock:
+            if password_hash_executor is None:
+                password_hash_executor = ProcessPoolExecutor(
+                    max_workers=app.config['PASSWORD_HASH_WORKERS'],
+                    mp_context=multiprocessing.get_context('forkserver')
+                )
+    try:
+        return password_hash_executor.submit(fn, *args).result()
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool next time and hash inline for this request
+        with password_hash_executor_lock:
+            password_hash_executor = None
+        return fn(*args)
+
+def hash_password(password):
+    return run_password_task(
+        generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_SALT_LENGTH']
+    )
+
+def verify_password(stored_hash, password):
+    return run_password_task(check_password_hash, stored_hash, password)
+
+def password_needs_rehash(stored_hash):
+    """Whether a stored hash was made with different parameters than the configured ones"""
+    method, _, rest = stored_hash.partition('$')
+    salt = rest.partition('$')[0]
+    return method != app.config['PASSWORD_HASH_METHOD'] or len(salt) != app.config['PASSWORD_SALT_LENGTH']
 
 # Registration route
 @app.route('/api/register', methods=['GET','POST'])
@@ -98,7 +350,7 @@ def register():
         return jsonify({"error": "Email already registered"}), 409
     
     # Hash the password before storing
-    hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+    hashed_password = hash_password(password)
     
     # Create new user
     new_user = User(
@@ -132,7 +384,15 @@ def login():
     user = User.query.filter_by(username=username).first()
     
     # Check if user exists and password is correct
-    if user and check_password_hash(user.password, password):
+    if user and verify_password(user.password, password):
+        # Transparently upgrade hashes made with old parameters while we have the plaintext
+        if password_needs_rehash(user.password):
+            try:
+                user.password = hash_password(password)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Password rehash failed for user {user.id}: {e}")
         return jsonify({
             "message": "Login successful",
             "user_id": user.id,
@@ -156,12 +416,24 @@ def get_user(user_id):
 
 @app.route('/api/profile/<int:user_id>', methods=['GET','PATCH','POST'])
 def get_profile(user_id):
-    user = User.query.get_or_404(user_id)
+    try:
+        return load_profile(user_id)
+    except IntegrityError:
+        # A concurrent first visit created the default rows first; they exist now, so load again
+        db.session.rollback()
+        return load_profile(user_id)
+
+def load_profile(user_id):
+    # Load the user with profile and stats in one joined query
+    user = User.query.options(
+        joinedload(User.profile),
+        joinedload(User.stats)
+    ).filter_by(id=user_id).first_or_404()
     
-    # Check if profile exists, if not create one
-    profile = UserProfile.query.filter_by(user_id=user_id).first()
+    # Create any missing default rows, committed together below
+    created_defaults = False
+    profile = user.profile
     if not profile:
-        # Create a default profile for this user
         profile = UserProfile(
             user_id=user_id,
             streak=0,
@@ -169,14 +441,10 @@ def get_profile(user_id):
             level=1,
             bio="New learner"
         )
-        db.session.add(profile)
-        db.session.commit()
+        user.profile = profile
+        created_defaults = True
     
-    # Now safely get activities
-    activities = UserActivity.query.filter_by(user_profile_id=profile.id).order_by(UserActivity.created_at.desc()).limit(5).all()
-    
-    # Check if stats exist, if not create them
-    stats = UserStats.query.filter_by(user_id=user_id).first()
+    stats = user.stats
     if not stats:
         stats = UserStats(
             user_id=user_id,
@@ -185,10 +453,22 @@ def get_profile(user_id):
             resources_used=0,
             last_active=datetime.utcnow()
         )
-        db.session.add(stats)
-        db.session.commit()
+        user.stats = stats
+        created_defaults = True
     
-    return jsonify({
+    # Only the first page of each feed is inlined; the feed endpoints serve the rest.
+    # A profile that was just created has no activity yet.
+    achievements, achievements_cursor = paginate_feed(
+        Achievement.query.filter_by(user_id=user_id),
+        Achievement.earned_at, Achievement.id, None, app.config['FEED_PAGE_SIZE']
+    )
+    if profile.id is None:
+        activities = []
+    else:
+        activities = UserActivity.query.filter_by(user_profile_id=profile.id).order_by(UserActivity.created_at.desc(), UserActivity.id.desc()).limit(5).all()
+    
+    # Build the response before committing, since committing expires the loaded objects
+    response = {
         "username": user.username,
         "profile": {
             "streak": profile.streak,
@@ -203,451 +483,2613 @@ def get_profile(user_id):
             "resources_used": stats.resources_used,
             "last_active": stats.last_active.isoformat() if stats.last_active else None
         },
-        "achievements": [
-            {
-                "title": a.title,
-                "description": a.description,
-                "icon": a.icon,
-                "earned_at": a.earned_at.isoformat()
-            } for a in Achievement.query.filter_by(user_id=user_id).all()
-        ],
-        "recent_activity": [
-            {
-                "type": a.activity_type,
-                "details": a.details,
-                "created_at": a.created_at.isoformat()
-            } for a in activities
-        ]
-    })
+        "achievements": [serialize_achievement(a) for a in achievements],
+        "achievements_next_cursor": achievements_cursor,
+        "recent_activity": [serialize_activity(a) for a in activities]
+    }
+    
+    if created_defaults:
+        db.session.commit()
+    
+    return jsonify(response)
 
 
+def serialize_achievement(achievement):
+    return {
+        "title": achievement.title,
+        "description": achievement.description,
+        "icon": achievement.icon,
+        "earned_at": achievement.earned_at.isoformat()
+    }
 
+def serialize_activity(activity):
+    return {
+        "type": activity.activity_type,
+        "details": activity.details,
+        "created_at": activity.created_at.isoformat()
+    }
 
-@app.route('/api/generate-learning-path', methods=['POST'])
-def generate_learning_path():
-    try:
-        data = request.get_json()
-        if not data or 'prompt' not in data:
-            return jsonify({"error": "No input prompt provided"}), 400
-        
-        input_text = data['prompt']
-        
-        # Create two separate API calls instead of one large response
-        # First call: Get basic path structure with limited topics
-        basic_path = generate_basic_path(input_text)
-        
-        # Second call: Enrich the path with details if necessary
-        if basic_path and "topics" in basic_path and len(basic_path["topics"]) > 0:
-            enriched_path = enrich_learning_path(basic_path)
-            return validate_and_enhance_response(enriched_path)
-        else:
-            return jsonify({
-                "status": "error",
-                "message": "Could not generate a valid learning path",
-                "suggestion": "Please try rephrasing your request"
-            }), 500
-                    
-    except Exception as e:
-        print(f"Endpoint error: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": "Internal server error",
-            "debug_info": str(e)
-        }), 500
+def encode_feed_cursor(created_at, row_id):
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
 
-def generate_basic_path(input_text):
-    """Generate basic path structure with limited topics"""
-    bedrock_runtime = boto3.client("bedrock-runtime", region_name="us-east-1")
-    
-    # Simplified system prompt focusing on core structure
-    system_prompt = """You MUST respond with valid JSON for a learning path with these fields:
-{
-  "title": "Short, concise title",
-  "overview": "Very brief description (1-2 sentences)",
-  "total_duration": "X weeks/months",
-  "topics": [
-    {
-      "name": "Topic Name",
-      "duration": "X days/weeks",
-      "description": "Brief description"
-    }
-  ]
-}
+def decode_feed_cursor(cursor):
+    """Return (created_at, id) from a feed cursor, raising ValueError if it is malformed"""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
 
-IMPORTANT RULES:
-1. Keep descriptions SHORT and CONCISE
-2. Include only 3-4 key topics maximum
-3. ONLY respond with valid JSON, nothing else"""
+def paginate_feed(query, created_column, id_column, cursor, limit):
+    """Keyset pagination, newest first: returns (rows, next_cursor) for the page after the cursor"""
+    if cursor:
+        created_at, row_id = decode_feed_cursor(cursor)
+        query = query.filter(or_(
+            created_column < created_at,
+            and_(created_column == created_at, id_column < row_id)
+        ))
+    rows = query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_feed_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
 
-    response = bedrock_runtime.invoke_model(
-        modelId="anthropic.claude-3-haiku-20240307-v1:0",
-        body=json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 1000,
-            "temperature": 0.2,
-            "system": system_prompt,
-            "messages": [{
-                "role": "user", 
-                "content": f"Create a concise learning path for: {input_text}. Focus on core topics only."
-            }]
-        })
-    )
+def feed_response(base_query, created_column, id_column, serialize):
+    """Serve one page of a feed, answering 304 when the feed has not changed since the client's copy"""
+    cursor = request.args.get('cursor')
+    try:
+        limit = min(int(request.args.get('limit', app.config['FEED_PAGE_SIZE'])), app.config['FEED_MAX_PAGE_SIZE'])
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
     
-    response_body = json.loads(response.get('body').read())
-    raw_response = response_body['content'][0]['text']
+    # Feeds are append-only, so row count and newest row identify their state.
+    # This index-only query lets an unchanged feed skip loading the page at all.
+    count, newest_id, newest_at = base_query.with_entities(
+        func.count(id_column), func.max(id_column), func.max(created_column)
+    ).one()
+    etag = hashlib.sha1(f"{count}|{newest_id}|{newest_at}|{cursor}|{limit}".encode('utf-8')).hexdigest()
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
     
-    # Parse JSON response
     try:
-        print(f"Raw response: {parse_json_response(raw_response)}")
-        return parse_json_response(raw_response)
-    except Exception as e:
-        print(f"Basic path generation failed: {e}")
-        return None
-
-def enrich_learning_path(basic_path):
-    """Add resources and projects to each topic"""
-    bedrock_runtime = boto3.client("bedrock-runtime", region_name="us-east-1")
-    
-    enriched_path = basic_path.copy()
+        rows, next_cursor = paginate_feed(base_query, created_column, id_column, cursor, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     
-    # Process each topic in sequence to stay within token limits
-    for i, topic in enumerate(basic_path['topics']):
-        # Simplified system prompt for resources and projects
-        system_prompt = f"""You MUST respond with valid JSON for learning resources and projects for the topic "{topic['name']}" with this structure:
-{{
-  "resources": [
-    {{
-      "type": "video/article/tutorial",
-      "title": "Resource Title",
-      "url": "https://example.com/resource",
-      "estimated_time": "X min/hours"
-    }}
-  ],
-  "projects": [
-    {{
-      "name": "Project Name",
-      "description": "Brief project description",
-      "complexity": "beginner/intermediate/advanced"
-    }}
-  ],
-  "study_plan": [
-    {{
-      "day": "Day 1",
-      "tasks": ["Brief task description"]
-    }}
-  ]
-}}
+    response = jsonify({
+        "items": [serialize(row) for row in rows],
+        "next_cursor": next_cursor
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-IMPORTANT RULES:
-1. Include 2-3 resources maximum (preferably YouTube links)
-2. Include 1-2 projects maximum
-3. Include 2-3 study days maximum
-4. Keep all text VERY concise
-5. ONLY respond with valid JSON, nothing else"""
+@app.route('/api/profile/<int:user_id>/activity', methods=['GET'])
+def get_activity_feed(user_id):
+    profile = UserProfile.query.filter_by(user_id=user_id).first()
+    if not profile:
+        return jsonify({"error": "Profile not found"}), 404
+    return feed_response(
+        UserActivity.query.filter_by(user_profile_id=profile.id),
+        UserActivity.created_at, UserActivity.id, serialize_activity
+    )
 
-        response = bedrock_runtime.invoke_model(
-            modelId="anthropic.claude-3-haiku-20240307-v1:0",
-            body=json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 1000,
-                "temperature": 0.2,
-                "system": system_prompt,
-                "messages": [{
-                    "role": "user", 
-                    "content": f"Create learning resources and projects for the topic '{topic['name']}' in the context of {basic_path['title']}."
-                }]
-            })
-        )
-        
-        response_body = json.loads(response.get('body').read())
-        raw_response = response_body['content'][0]['text']
-        print(f"Raw response: {raw_response}")
-        
-        try:
-            topic_details = parse_json_response(raw_response)
-            
-            if topic_details:
-                # Merge the topic details with the basic topic info
-                enriched_path['topics'][i].update({
-                    "resources": topic_details.get("resources", []),
-                    "projects": topic_details.get("projects", []),
-                    "study_plan": topic_details.get("study_plan", [])
-                })
-                
-                # Convert YouTube URLs to embed format
-                for resource in enriched_path['topics'][i]["resources"]:
-                    if 'url' in resource and ('youtube.com' in resource['url'] or 'youtu.be' in resource['url']):
-                        resource['url'] = convert_to_embed_url(resource['url'])
-        except Exception as e:
-            print(f"Topic enrichment failed for {topic['name']}: {e}")
-            # If enrichment fails, provide default values
-            enriched_path['topics'][i].update({
-                "resources": [{"type": "article", "title": "Introduction to " + topic['name'], "url": "https://example.com", "estimated_time": "30 min"}],
-                "projects": [{"name": "Basic " + topic['name'] + " Project", "description": "Apply what you learned", "complexity": "beginner"}],
-                "study_plan": [{"day": "Day 1", "tasks": ["Study " + topic['name']]}]
-            })
-    
-    return enriched_path
+@app.route('/api/profile/<int:user_id>/achievements', methods=['GET'])
+def get_achievement_feed(user_id):
+    if not db.session.get(User, user_id):
+        return jsonify({"error": "User not found"}), 404
+    return feed_response(
+        Achievement.query.filter_by(user_id=user_id),
+        Achievement.earned_at, Achievement.id, serialize_achievement
+    )
 
-def parse_json_response(raw_response):
-    """Try multiple methods to parse JSON from the response"""
-    # Direct JSON parse
-    try:
-        return json.loads(raw_response)
-    except json.JSONDecodeError:
-        # Extract JSON from markdown code block
-        try:
-            json_match = re.search(r'```(?:json)?\n(.*?)\n```', raw_response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group(1))
-        except Exception:
-            pass
-        
-        # Attempt repair
-        try:
-            return repair_json_response(raw_response)
-        except Exception:
-            pass
-    
-    return None
+# Hot-path instrumentation, exposed in the Prometheus text format on /metrics
+logger = logging.getLogger(__name__)
 
-def validate_and_enhance_response(learning_path):
-    """Validate and add missing structure to the response"""
-    if not isinstance(learning_path, dict):
-        raise ValueError("Response is not a JSON object")
-    
-    # Required fields with defaults
-    learning_path.setdefault('title', 'Custom Learning Path')
-    learning_path.setdefault('overview', '')
-    learning_path.setdefault('total_duration', '4-6 weeks')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+class Histogram:
+    """Thread-safe latency histogram with one series per label set"""
     
-    # Ensure topics array exists
-    if not isinstance(learning_path.get('topics'), list):
-        learning_path['topics'] = []
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
     
-    # Enhance each topic
-    for i, topic in enumerate(learning_path['topics']):
-        topic.setdefault('name', f'Topic {i+1}')
-        topic.setdefault('duration', '1 week')
-        topic.setdefault('description', '')
-        
-        # Ensure resources exist
-        topic.setdefault('resources', [])
-        
-        # Ensure study plan exists
-        if not isinstance(topic.get('study_plan'), list):
-            topic['study_plan'] = [{
-                'day': 'Day 1',
-                'tasks': ['Study core concepts']
-            }]
-        
-        # Validate projects
-        if not isinstance(topic.get('projects'), list):
-            topic['projects'] = [{
-                'name': 'Practical Application',
-                'description': 'Apply what you learned',
-                'complexity': 'intermediate'
-            }]
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
     
-    return jsonify({
-        "status": "success",
-        "learning_path": learning_path
-    })
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{format_labels(key + (('le', bound),))} {count}")
+                lines.append(f"{self.name}_bucket{format_labels(key + (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{format_labels(key)} {series['count']}")
+        return lines
 
-def repair_json_response(raw_text):
-    """Use AI to repair malformed JSON responses"""
-    client = boto3.client("bedrock-runtime", region_name="us-east-1")
+class Counter:
+    """Thread-safe monotonic counter with one series per label set"""
     
-    response = client.invoke_model(
-        modelId="anthropic.claude-3-haiku-20240307-v1:0",
-        body=json.dumps({
-            "anthropic_version": "bedrock-2023-05-31",
-            "max_tokens": 500,
-            "temperature": 0,
-            "system": "You are a helpful assistant who can fix malformed JSON responses.",
-            "messages": [{
-                "role": "user", 
-                "content": f"Repair this malformed JSON: {raw_text}"
-            }]
-        })
-    )
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.series = {}
+        self.lock = threading.Lock()
+    
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
     
-    response_body = json.loads(response.get('body').read())
-    return json.loads(response_body['content'][0]['text'])
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.series.items()):
+                lines.append(f"{self.name}{format_labels(key)} {value}")
+        return lines
 
-def convert_to_embed_url(url):
-    """Convert YouTube URL to embed format"""
-    # Handle standard YouTube URLs
-    if 'youtube.com/watch' in url:
-        video_id = url.split('v=')[1].split('&')[0]
-        return f"https://www.youtube.com/embed/{video_id}"
-    # Handle youtu.be shortened URLs
-    elif 'youtu.be' in url:
-        video_id = url.split('/')[-1].split('?')[0]
-        return f"https://www.youtube.com/embed/{video_id}"
-    # Already an embed URL or not a YouTube URL
-    return url
+stage_duration = Histogram('aiws_stage_duration_seconds', 'Time spent in each stage of generation and storage')
+http_request_duration = Histogram('aiws_http_request_duration_seconds', 'Time to build the response (first byte for streams)')
+bedrock_tokens = Counter('aiws_bedrock_tokens_total', 'Tokens reported by Bedrock, by prompt template and direction')
+bedrock_requests = Counter('aiws_bedrock_requests_total', 'Bedrock calls by prompt template and stop reason')
 
+@contextmanager
+def timed_span(stage, **labels):
+    """Record how long the block takes under the stage, with outcome="error" if it raises"""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        stage_duration.observe(time.perf_counter() - started, stage=stage, outcome=outcome, **labels)
 
-@app.route('/api/save-learning-path', methods=['POST'])
-def save_learning_path():
+def record_bedrock_usage(template, usage, stop_reason=None):
+    bedrock_tokens.inc(usage.get('input_tokens', 0), template=template, direction="input")
+    bedrock_tokens.inc(usage.get('output_tokens', 0), template=template, direction="output")
+    bedrock_requests.inc(template=template, stop_reason=stop_reason or "unknown")
+
+def log_sampled(message, *args):
+    """Debug-log a sample of large payloads instead of printing every one"""
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < app.config['DEBUG_LOG_SAMPLE_RATE']:
+        logger.debug(message, *args)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_duration(response):
+    started = g.get('request_started')
+    if started is not None:
+        http_request_duration.observe(
+            time.perf_counter() - started,
+            endpoint=request.url_rule.rule if request.url_rule else "unmatched",
+            method=request.method,
+            status=response.status_code
+        )
+    return response
+
+# Process-wide AWS clients, keyed by (service, region) and created on first use.
+# boto3 clients are thread-safe, so one client (and its connection pool) is shared
+# by every request thread; the semaphore caps in-flight calls at the pool size so
+# that we can measure how long callers wait for a free connection.
+aws_clients = {}
+aws_client_slots = {}
+aws_clients_lock = threading.Lock()
+aws_client_metrics = {}
+
+def get_aws_client(service_name, region_name):
+    """Return the shared boto3 client for a service and region, creating it if needed"""
+    key = (service_name, region_name)
+    client = aws_clients.get(key)
+    if client is None:
+        with aws_clients_lock:
+            client = aws_clients.get(key)
+            if client is None:
+                client_config = Config(
+                    max_pool_connections=app.config['AWS_MAX_POOL_CONNECTIONS'],
+                    retries={
+                        'max_attempts': app.config['AWS_MAX_RETRIES'],
+                        'mode': app.config['AWS_RETRY_MODE']
+                    },
+                    connect_timeout=app.config['AWS_CONNECT_TIMEOUT'],
+                    read_timeout=app.config['AWS_READ_TIMEOUT'],
+                    tcp_keepalive=app.config['AWS_TCP_KEEPALIVE']
+                )
+                client = boto3.client(service_name, region_name=region_name, config=client_config)
+                aws_client_slots[key] = threading.BoundedSemaphore(app.config['AWS_MAX_POOL_CONNECTIONS'])
+                aws_client_metrics[key] = {
+                    "checkouts": 0,
+                    "in_use": 0,
+                    "wait_seconds_total": 0.0,
+                    "wait_seconds_max": 0.0
+                }
+                aws_clients[key] = client
+    return client
+
+@contextmanager
+def checkout_aws_client(service_name, region_name):
+    """Borrow the shared client for the duration of one call, waiting for a free connection slot"""
+    key = (service_name, region_name)
+    client = get_aws_client(service_name, region_name)
+    slots = aws_client_slots[key]
+    
+    wait_start = time.monotonic()
+    slots.acquire()
+    waited = time.monotonic() - wait_start
+    
+    metrics = aws_client_metrics[key]
+    with aws_clients_lock:
+        metrics["checkouts"] += 1
+        metrics["in_use"] += 1
+        metrics["wait_seconds_total"] += waited
+        metrics["wait_seconds_max"] = max(metrics["wait_seconds_max"], waited)
     try:
-        data = request.get_json()
-        
-        # Validate input data
-        if not data or 'learning_path' not in data:
-            return jsonify({"error": "No learning path data provided"}), 400
-        
-        # Extract data
-        learning_path = data.get('learning_path')
-        user_id = data.get('userId', 'anonymous')
-        
-        # Prepare the payload for Lambda
-        lambda_payload = {
-            'body': {
-                'learning_path': learning_path,
-                'user_id': user_id
-            }
+        yield client
+    finally:
+        with aws_clients_lock:
+            metrics["in_use"] -= 1
+        slots.release()
+
+def get_aws_client_metrics():
+    """Snapshot of pool checkout metrics for every client created so far"""
+    with aws_clients_lock:
+        return {
+            f"{service}@{region}": {
+                **metrics,
+                "pool_size": app.config['AWS_MAX_POOL_CONNECTIONS'],
+                "wait_seconds_avg": metrics["wait_seconds_total"] / metrics["checkouts"] if metrics["checkouts"] else 0.0
+            } for (service, region), metrics in aws_client_metrics.items()
         }
-        
-        # Initialize Lambda client
-        lambda_client = boto3.client('lambda', region_name='ap-southeast-2')
-        
-        # Invoke Lambda function
-        response = lambda_client.invoke(
-            FunctionName='aiws-lambda',  
-            InvocationType='RequestResponse',
-            Payload=json.dumps(lambda_payload)
-        )
-        
-        # Parse Lambda response
-        response_payload = json.loads(response['Payload'].read().decode('utf-8'))
 
+class BedrockRateLimitExceeded(Exception):
+    """Raised when a Bedrock call would have to queue longer than BEDROCK_RATE_LIMIT_MAX_WAIT"""
+    
+    def __init__(self, model_id, retry_after):
+        super().__init__(f"Rate limit for {model_id} exceeded, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Token bucket that queues callers in arrival order.
+    
+    Each caller reserves the next token, possibly one that has not been refilled
+    yet, and sleeps until it is due; a caller whose token is further away than
+    max_wait gives its reservation back and is rejected instead.
+    """
+    
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {"acquired": 0, "rejected": 0, "queued": 0, "wait_seconds_total": 0.0}
+    
+    def acquire(self, max_wait):
+        """Take a token, sleeping until it is available.
         
-        # Return success response to client
-        if response['StatusCode'] == 200:
-            return jsonify(json.loads(response_payload.get('body'))), 200
-        else:
-            return jsonify({"error": "Failed to store learning path"}), 500
+        Returns (acquired, wait_seconds); when rejected, wait_seconds is how long the token was away.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            wait_for = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            if wait_for > max_wait:
+                self.tokens += 1
+                self.stats["rejected"] += 1
+                return False, wait_for
+            self.stats["acquired"] += 1
+            if wait_for > 0:
+                self.stats["queued"] += 1
+                self.stats["wait_seconds_total"] += wait_for
+        if wait_for > 0:
+            time.sleep(wait_for)
+        return True, wait_for
     
-    except ClientError as e:
-        print(f"AWS client error: {str(e)}")
-        return jsonify({"error": f"AWS error: {str(e)}"}), 500
-    except Exception as e:
-        print(f"Error in save_learning_path: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats, "rate": self.rate, "burst": self.burst}
 
+bedrock_rate_limiters = {}
+bedrock_rate_limiters_lock = threading.Lock()
 
+def acquire_bedrock_capacity(model_id):
+    """Wait for the model's rate limiter, raising BedrockRateLimitExceeded if the queue is too long"""
+    limiter = bedrock_rate_limiters.get(model_id)
+    if limiter is None:
+        limits = app.config['BEDROCK_RATE_LIMITS'].get(model_id)
+        if limits is None:
+            return
+        with bedrock_rate_limiters_lock:
+            limiter = bedrock_rate_limiters.setdefault(model_id, TokenBucket(limits['rate'], limits['burst']))
+    
+    acquired, wait_for = limiter.acquire(app.config['BEDROCK_RATE_LIMIT_MAX_WAIT'])
+    if not acquired:
+        raise BedrockRateLimitExceeded(model_id, wait_for)
 
-# Add this function to your Flask app
-def generate_roadmap_flowchart(learning_path):
-    """Generate a Mermaid flowchart string based on the learning path"""
+class SingleFlight:
+    """Lets concurrent callers doing the same work share one execution.
     
-    # Start the flowchart
-    flowchart = "flowchart TD\n"
+    The first caller to join a key becomes the leader and must call finish()
+    with its result; everyone else joining before then waits for that result.
+    """
     
-    # Add title node
-    title_id = "title"
-    title_text = learning_path.get('title', 'Learning Path')
-    flowchart += f"    {title_id}[\"{title_text}\"] --> overview\n"
+    class Flight:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.followers = 0
     
-    # Add overview node
-    overview_text = learning_path.get('overview', 'Complete this learning path')
-    flowchart += f"    overview[\"Overview: {overview_text}\"] --> start\n"
-    flowchart += f"    start([\"Start Learning\"])\n"
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.stats = {"leaders": 0, "followers": 0}
     
-    # Add connections from start to first topics
-    if learning_path.get('topics') and len(learning_path['topics']) > 0:
-        flowchart += f"    start --> topic0\n"
+    def join(self, key):
+        """Return (flight, is_leader) for the key"""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = self.Flight()
+                self.stats["leaders"] += 1
+                return flight, True
+            flight.followers += 1
+            self.stats["followers"] += 1
+            return flight, False
     
-    # Process each topic
-    for i, topic in enumerate(learning_path.get('topics', [])):
-        topic_name = topic.get('name', f'Topic {i+1}')
-        topic_id = f"topic{i}"
-        
-        # Add topic node
-        flowchart += f"    {topic_id}[\"{topic_name}\"] --> {topic_id}_details\n"
+    def finish(self, key, result):
+        with self.lock:
+            flight = self.flights.pop(key)
+        flight.result = result
+        flight.done.set()
+    
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats, "in_flight": len(self.flights)}
+
+generation_flights = SingleFlight()
+
+def prompt_template_version():
+    """Identifies the prompts in use, so cached output is only reused for the same prompts"""
+    return f"{PROMPT_TEMPLATE_VERSION}-{app.config['PROMPT_VARIANT']}"
+
+def compact_prompts():
+    return app.config['PROMPT_VARIANT'] == 'compact'
+
+class TokenBudgets:
+    """Chooses max_tokens for each prompt template from the output lengths seen so far.
+    
+    A template uses its MAX_TOKENS_DEFAULTS entry until MAX_TOKENS_MIN_SAMPLES complete
+    outputs have been observed; after that its budget is the 99th percentile of recent
+    outputs times MAX_TOKENS_HEADROOM. Budgets are per unit, so a batched request for
+    several topics asks for one topic's budget per topic.
+    """
+    
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.stats = {}
+    
+    def budget(self, template, units=1, min_tokens=0):
+        per_unit = app.config['MAX_TOKENS_DEFAULTS'][template]
+        if app.config['ADAPTIVE_MAX_TOKENS']:
+            with self.lock:
+                samples = sorted(self.samples.get(template, ()))
+            if len(samples) >= app.config['MAX_TOKENS_MIN_SAMPLES']:
+                p99 = samples[min(len(samples) - 1, int(0.99 * len(samples)))]
+                per_unit = math.ceil(p99 * app.config['MAX_TOKENS_HEADROOM'])
+        return min(app.config['MAX_TOKENS_CEILING'], max(min_tokens, per_unit * units))
+    
+    def observe(self, template, output_tokens, units=1):
+        """Record a complete output; truncated ones would only understate what the template needs"""
+        with self.lock:
+            samples = self.samples.get(template)
+            if samples is None or samples.maxlen != app.config['MAX_TOKENS_WINDOW']:
+                samples = self.samples[template] = deque(samples or (), maxlen=app.config['MAX_TOKENS_WINDOW'])
+            samples.append(output_tokens / units)
+    
+    def record(self, template, event):
+        with self.lock:
+            counts = self.stats.setdefault(template, {"truncated": 0, "retried": 0})
+            counts[event] += 1
+    
+    def get_stats(self):
+        stats = {}
+        for template in app.config['MAX_TOKENS_DEFAULTS']:
+            with self.lock:
+                samples = len(self.samples.get(template, ()))
+                counts = dict(self.stats.get(template, {"truncated": 0, "retried": 0}))
+            stats[template] = {"budget": self.budget(template), "samples": samples, **counts}
+        return stats
+
+token_budgets = TokenBudgets()
+
+def invoke_bedrock_model(request_body, template, units=1, min_tokens=0):
+    """Send one invoke_model request through the shared Bedrock client and return the decoded response body.
+    
+    template names the prompt the request was built from; it picks the max_tokens budget
+    (units of it, at least min_tokens) and labels timing and token metrics. An answer cut
+    off at max_tokens is requested once more with twice the budget.
+    """
+    max_tokens = token_budgets.budget(template, units, min_tokens)
+    response_body = call_bedrock_model({**request_body, "max_tokens": max_tokens}, template)
+    if response_body.get('stop_reason') == 'max_tokens':
+        token_budgets.record(template, "truncated")
+        if max_tokens < app.config['MAX_TOKENS_CEILING']:
+            # A truncated answer would otherwise go through JSON repair, which costs more than finishing it
+            token_budgets.record(template, "retried")
+            max_tokens = min(app.config['MAX_TOKENS_CEILING'], max_tokens * 2)
+            response_body = call_bedrock_model({**request_body, "max_tokens": max_tokens}, template)
+    if response_body.get('stop_reason') != 'max_tokens':
+        token_budgets.observe(template, (response_body.get('usage') or {}).get('output_tokens', 0), units)
+    return response_body
+
+def call_bedrock_model(request_body, template):
+    acquire_bedrock_capacity(BEDROCK_MODEL_ID)
+    with timed_span("bedrock_invoke", template=template):
+        with checkout_aws_client("bedrock-runtime", BEDROCK_REGION) as bedrock_runtime:
+            response = bedrock_runtime.invoke_model(
+                modelId=BEDROCK_MODEL_ID,
+                body=json.dumps(request_body)
+            )
+            response_body = json.loads(response.get('body').read())
+    record_bedrock_usage(template, response_body.get('usage') or {}, response_body.get('stop_reason'))
+    return response_body
+
+def stream_bedrock_model(request_body, template):
+    """Send one request through invoke_model_with_response_stream, yielding text deltas as they arrive.
+    
+    Text has already been passed on by the time a stream is cut off, so truncated streams are
+    not retried; the caller's JSON repair closes them instead.
+    """
+    request_body = {**request_body, "max_tokens": token_budgets.budget(template)}
+    acquire_bedrock_capacity(BEDROCK_MODEL_ID)
+    started = time.perf_counter()
+    usage = {}
+    stop_reason = None
+    with checkout_aws_client("bedrock-runtime", BEDROCK_REGION) as bedrock_runtime:
+        response = bedrock_runtime.invoke_model_with_response_stream(
+            modelId=BEDROCK_MODEL_ID,
+            body=json.dumps(request_body)
+        )
+        for event in response.get('body'):
+            chunk = event.get('chunk')
+            if not chunk:
+                continue
+            message = json.loads(chunk['bytes'])
+            if message.get('type') == 'content_block_delta' and message['delta'].get('type') == 'text_delta':
+                if started is not None:
+                    stage_duration.observe(time.perf_counter() - started, stage="bedrock_first_token", outcome="ok", template=template)
+                    started = None
+                yield message['delta']['text']
+            elif message.get('type') == 'message_start':
+                usage.update(message.get('message', {}).get('usage') or {})
+            elif message.get('type') == 'message_delta':
+                usage.update(message.get('usage') or {})
+                stop_reason = message.get('delta', {}).get('stop_reason') or stop_reason
+    record_bedrock_usage(template, usage, stop_reason)
+    if stop_reason == 'max_tokens':
+        token_budgets.record(template, "truncated")
+    else:
+        token_budgets.observe(template, usage.get('output_tokens', 0))
+
+class TopicStreamParser:
+    """Incremental JSON scanner that picks complete elements of the top-level "topics"
+    array out of a learning path while the model is still generating it.
+    
+    feed() returns (index, topic) for every element completed by the new text. Once
+    the array opens, the fields before it (title, overview, ...) are available as
+    header. Anything before the first '{' (prose, a code fence) is skipped.
+    """
+    
+    def __init__(self):
+        self.text = ''
+        self.pos = 0
+        self.root_start = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.last_string = None
+        self.expect_topics = False
+        self.topics_depth = None
+        self.topics_closed = False
+        self.element_start = None
+        self.element_count = 0
+        self.header = None
+    
+    def feed(self, chunk):
+        self.text += chunk
+        completed = []
+        text = self.text
+        for pos in range(self.pos, len(text)):
+            ch = text[pos]
+            if self.root_start is None:
+                if ch != '{':
+                    continue
+                self.root_start = pos
+            
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == '\\':
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+                    self.last_string = text[self.string_start:pos]
+                continue
+            
+            if ch in ' \t\r\n':
+                continue
+            if ch == ':':
+                self.expect_topics = self.depth == 1 and self.last_string == 'topics' and self.topics_depth is None
+                continue
+            
+            if ch == '"':
+                self.in_string = True
+                self.string_start = pos + 1
+            elif ch in '{[':
+                self.depth += 1
+                if ch == '[' and self.expect_topics:
+                    self.topics_depth = self.depth
+                    self.header = self.parse_header(text[self.root_start:pos + 1])
+                elif ch == '{' and self.in_topics() and self.depth == self.topics_depth + 1:
+                    self.element_start = pos
+            elif ch in '}]':
+                if ch == '}' and self.element_start is not None and self.depth == self.topics_depth + 1:
+                    try:
+                        completed.append((self.element_count, json.loads(text[self.element_start:pos + 1])))
+                    except json.JSONDecodeError:
+                        pass  # Left for the full parse once the stream ends
+                    self.element_count += 1
+                    self.element_start = None
+                elif ch == ']' and self.in_topics() and self.depth == self.topics_depth:
+                    self.topics_closed = True
+                self.depth -= 1
+            self.expect_topics = False
         
-        # Add topic details subgraph
-        topic_duration = topic.get('duration', '1 week')
-        flowchart += f"    {topic_id}_details[\"Duration: {topic_duration}\"] --> {topic_id}_resources\n"
+        self.pos = len(text)
+        return completed
+    
+    def in_topics(self):
+        return self.topics_depth is not None and not self.topics_closed
+    
+    def parse_header(self, prefix):
+        try:
+            header = json.loads(prefix + ']}')
+        except json.JSONDecodeError:
+            return None
+        header.pop('topics', None)
+        return header
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed number of seconds"""
+    
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                del self.entries[key]
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+    
+    def put(self, key, value, stored_at=None):
+        with self.lock:
+            self.entries[key] = (value, stored_at if stored_at is not None else time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+    
+    def get_stats(self):
+        with self.lock:
+            return {**self.stats, "size": len(self.entries), "max_size": self.max_size}
+
+def normalize_prompt(text):
+    """Canonical form of a prompt so trivially different spellings share a cache entry"""
+    text = unicodedata.normalize('NFKC', text).casefold()
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text.rstrip('.!?').strip()
+
+class LearningPathCache:
+    """Learning path cache with an in-memory LRU tier and an optional database tier.
+    
+    Entries are keyed on the normalized prompt, the model ID and the prompt template
+    version, and store the enriched path before validation as JSON text so every
+    hit hands out an independent copy.
+    """
+    
+    def __init__(self):
+        self.memory = None
+        self.lock = threading.Lock()
+        self.stats = {"persistent_hits": 0, "persistent_errors": 0}
+    
+    def get_memory_tier(self):
+        if self.memory is None:
+            with self.lock:
+                if self.memory is None:
+                    self.memory = TTLCache(app.config['PATH_CACHE_SIZE'], app.config['PATH_CACHE_TTL'])
+        return self.memory
+    
+    def make_key(self, prompt):
+        raw_key = f"{prompt_template_version()}|{BEDROCK_MODEL_ID}|{normalize_prompt(prompt)}"
+        return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+    
+    def get(self, prompt):
+        key = self.make_key(prompt)
+        cached = self.get_memory_tier().get(key)
+        if cached is None and app.config['PATH_CACHE_PERSIST']:
+            cached = self.get_persistent(key)
+        return json.loads(cached) if cached is not None else None
+    
+    def get_persistent(self, key):
+        try:
+            row = db.session.get(CachedLearningPath, key)
+            if row is None:
+                return None
+            stored_at = (row.created_at - datetime(1970, 1, 1)).total_seconds()
+            if time.time() - stored_at > app.config['PATH_CACHE_TTL']:
+                db.session.delete(row)
+                db.session.commit()
+                return None
+            # Promote to the memory tier, keeping the original age so the TTL still applies
+            self.get_memory_tier().put(key, row.learning_path, stored_at)
+            with self.lock:
+                self.stats["persistent_hits"] += 1
+            return row.learning_path
+        except Exception as e:
+            db.session.rollback()
+            with self.lock:
+                self.stats["persistent_errors"] += 1
+            print(f"Learning path cache read failed: {e}")
+            return None
+    
+    def put(self, prompt, learning_path):
+        key = self.make_key(prompt)
+        serialized = json.dumps(learning_path)
+        self.get_memory_tier().put(key, serialized)
+        if not app.config['PATH_CACHE_PERSIST']:
+            return
+        try:
+            db.session.merge(CachedLearningPath(
+                key=key,
+                prompt=normalize_prompt(prompt),
+                learning_path=serialized,
+                created_at=datetime.utcnow()
+            ))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            with self.lock:
+                self.stats["persistent_errors"] += 1
+            print(f"Learning path cache write failed: {e}")
+    
+    def get_stats(self):
+        with self.lock:
+            persistent_stats = dict(self.stats)
+        return {**self.get_memory_tier().get_stats(), **persistent_stats}
+
+learning_path_cache = LearningPathCache()
+
+# Words that say nothing about what a path is about, ignored when bucketing path titles
+PATH_TITLE_STOPWORDS = {
+    'a', 'an', 'and', 'the', 'of', 'for', 'to', 'in', 'on', 'with', 'using', 'from',
+    'learning', 'learn', 'path', 'roadmap', 'guide', 'course', 'introduction', 'intro',
+    'beginner', 'beginners', 'advanced', 'intermediate', 'complete', 'mastering', 'master',
+    'fundamentals', 'basics', 'essentials'
+}
+
+def path_context_bucket(path_title):
+    """Coarse subject bucket for a path title, e.g. 'Machine Learning with Python' -> 'machine python'"""
+    keywords = []
+    for word in re.findall(r'[\w+#]+', normalize_prompt(path_title or '')):
+        if word not in PATH_TITLE_STOPWORDS and word not in keywords:
+            keywords.append(word)
+    return ' '.join(sorted(keywords[:3]))
+
+class TopicCache:
+    """Enriched topic details shared across learning paths.
+    
+    Keyed on the normalized topic name, the bucket of the enclosing path title and
+    the prompt template version, so "Linear Algebra" generated for one machine
+    learning path is reused by the next one without a model call.
+    """
+    
+    def __init__(self):
+        self.entries = None
+        self.lock = threading.Lock()
+    
+    def get_entries(self):
+        if self.entries is None:
+            with self.lock:
+                if self.entries is None:
+                    self.entries = TTLCache(app.config['TOPIC_CACHE_SIZE'], app.config['TOPIC_CACHE_TTL'])
+        return self.entries
+    
+    def make_key(self, topic_name, path_title):
+        return (normalize_prompt(topic_name), path_context_bucket(path_title), prompt_template_version())
+    
+    def get(self, topic_name, path_title):
+        cached = self.get_entries().get(self.make_key(topic_name, path_title))
+        return json.loads(cached) if cached is not None else None
+    
+    def put(self, topic_name, path_title, details):
+        self.get_entries().put(self.make_key(topic_name, path_title), json.dumps(details))
+    
+    def get_stats(self):
+        return self.get_entries().get_stats()
+
+topic_cache = TopicCache()
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        "aws_clients": get_aws_client_metrics(),
+        "learning_path_cache": learning_path_cache.get_stats(),
+        "topic_cache": topic_cache.get_stats(),
+        "json_parse": dict(json_parse_metrics),
+        "bedrock_rate_limits": {model_id: limiter.get_stats() for model_id, limiter in list(bedrock_rate_limiters.items())},
+        "generation_single_flight": generation_flights.get_stats(),
+        "database": get_database_pool_stats(),
+        "storage": get_storage_metrics(),
+        "flowchart_fragments": topic_flowchart_fragment.cache_info()._asdict(),
+        "flowchart_svg": {**flowchart_svg_cache.get_stats(), "renders": flowchart_renders.get_stats()},
+        "token_budgets": token_budgets.get_stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_prometheus_metrics():
+    """Stage timings, request latency and Bedrock usage in the Prometheus text format"""
+    lines = []
+    for metric in (stage_duration, http_request_duration, bedrock_tokens, bedrock_requests):
+        lines.extend(metric.expose())
+    lines.append("# HELP aiws_json_parse_total Model responses parsed, by the branch that succeeded")
+    lines.append("# TYPE aiws_json_parse_total counter")
+    with json_parse_metrics_lock:
+        for branch, count in json_parse_metrics.items():
+            lines.append(f'aiws_json_parse_total{{branch="{branch}"}} {count}')
+    return Response("\n".join(lines) + "\n", content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/api/generate-learning-path', methods=['POST'])
+def generate_learning_path():
+    try:
+        data = request.get_json()
+        if not data or 'prompt' not in data:
+            return jsonify({"error": "No input prompt provided"}), 400
         
-        # Add resources node
-        flowchart += f"    {topic_id}_resources{{{len(topic.get('resources', []))} Resources}}\n"
+        input_text = data['prompt']
+        enrichment_mode = data.get('enrichment_mode', app.config['ENRICHMENT_MODE'])
+        if enrichment_mode not in ENRICHMENT_MODES:
+            return jsonify({"error": f"enrichment_mode must be one of {', '.join(ENRICHMENT_MODES)}"}), 400
         
-        # Add projects node
-        flowchart += f"    {topic_id}_resources --> {topic_id}_projects\n"
-        flowchart += f"    {topic_id}_projects{{{len(topic.get('projects', []))} Projects}}\n"
+        event = run_learning_path_pipeline(input_text, enrichment_mode)
+        if event["event"] == "error":
+            return jsonify({
+                "status": "error",
+                "message": event["message"],
+                "suggestion": event["suggestion"]
+            }), 500
+        return jsonify({key: value for key, value in event.items() if key != "event"})
+    
+    except BedrockRateLimitExceeded as e:
+        return jsonify({
+            "status": "error",
+            "message": "Too many learning paths are being generated right now",
+            "suggestion": "Please try again in a few seconds"
+        }), 429, {'Retry-After': str(math.ceil(e.retry_after))}
+                    
+    except Exception as e:
+        print(f"Endpoint error: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Internal server error",
+            "debug_info": str(e)
+        }), 500
+
+@app.route('/api/generate-learning-path/stream', methods=['POST'])
+def stream_learning_path():
+    """Streaming variant of generate_learning_path.
+    
+    Emits the path skeleton as soon as it is parsed, each enriched topic as it
+    completes, then the flowchart and the final validated path. Responds with
+    Server-Sent Events when the client accepts text/event-stream, otherwise
+    with newline-delimited JSON.
+    """
+    data = request.get_json()
+    if not data or 'prompt' not in data:
+        return jsonify({"error": "No input prompt provided"}), 400
+    
+    input_text = data['prompt']
+    enrichment_mode = data.get('enrichment_mode', app.config['ENRICHMENT_MODE'])
+    if enrichment_mode not in ENRICHMENT_MODES:
+        return jsonify({"error": f"enrichment_mode must be one of {', '.join(ENRICHMENT_MODES)}"}), 400
+    use_sse = request.accept_mimetypes.best == 'text/event-stream'
+    
+    def serialize(event):
+        if use_sse:
+            return f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+        return json.dumps(event) + "\n"
+    
+    def generate():
+        try:
+            for event in generate_learning_path_events(input_text, enrichment_mode):
+                yield serialize(event)
+        except BedrockRateLimitExceeded as e:
+            yield serialize({
+                "event": "error",
+                "message": "Too many learning paths are being generated right now",
+                "suggestion": "Please try again in a few seconds",
+                "retry_after": e.retry_after
+            })
+        except Exception as e:
+            print(f"Streaming endpoint error: {str(e)}")
+            yield serialize({"event": "error", "message": "Internal server error", "debug_info": str(e)})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream' if use_sse else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def run_learning_path_pipeline(input_text, enrichment_mode='per_topic'):
+    """Run the same staged pipeline as the streaming endpoint and return only its final event"""
+    for event in generate_learning_path_events(input_text, enrichment_mode):
+        if event["event"] in ("complete", "error"):
+            return event
+    raise RuntimeError("Learning path pipeline finished without a result")
+
+def generate_learning_path_events(input_text, enrichment_mode='per_topic'):
+    """Run the generation pipeline, yielding an event dict for each stage as it completes.
+    
+    Events are "skeleton", "topic_outline" (pipelined mode only, as each topic of the
+    skeleton arrives), "topic" (an enriched topic), "flowchart", "complete" and "error".
+    """
+    enriched_path = learning_path_cache.get(input_text)
+    shared = enriched_path is not None
+    
+    if enriched_path is None:
+        # Identical prompts already being generated share that generation instead of starting another
+        flight_key = learning_path_cache.make_key(input_text)
+        flight, is_leader = generation_flights.join(flight_key)
+        if not is_leader and flight.done.wait(app.config['SINGLE_FLIGHT_MAX_WAIT']):
+            if flight.result is None:
+                yield {
+                    "event": "error",
+                    "message": "Could not generate a valid learning path",
+                    "suggestion": "Please try rephrasing your request"
+                }
+                return
+            enriched_path = json.loads(flight.result)
+            shared = True
+        else:
+            try:
+                enriched_path = yield from run_generation_pipeline(input_text, enrichment_mode)
+            finally:
+                if is_leader:
+                    generation_flights.finish(flight_key, json.dumps(enriched_path) if enriched_path is not None else None)
+            if enriched_path is None:
+                yield {
+                    "event": "error",
+                    "message": "Could not generate a valid learning path",
+                    "suggestion": "Please try rephrasing your request"
+                }
+                return
+    
+    if shared:
+        yield {"event": "skeleton", "cached": True, "learning_path": enriched_path}
+        for i, topic in enumerate(enriched_path.get('topics', [])):
+            yield {"event": "topic", "index": i, "topic": topic}
+    
+    payload = build_learning_path_response(enriched_path)
+    flowchart_event = {"event": "flowchart", "roadmap_flowchart": payload["roadmap_flowchart"]}
+    if "roadmap_svg_url" in payload:
+        flowchart_event["roadmap_svg_url"] = payload["roadmap_svg_url"]
+    yield flowchart_event
+    yield {"event": "complete", **payload}
+
+def run_generation_pipeline(input_text, enrichment_mode):
+    """Generate and enrich a new learning path, yielding its events; returns the enriched path or None"""
+    if app.config['BEDROCK_STREAMING']:
+        enriched_path, failed_topics = yield from pipelined_enrichment_events(input_text, enrichment_mode)
+    else:
+        enriched_path, failed_topics = yield from sequential_enrichment_events(input_text, enrichment_mode)
+    
+    # Paths padded with placeholder defaults are not worth keeping
+    if enriched_path is not None and not failed_topics:
+        learning_path_cache.put(input_text, enriched_path)
+    return enriched_path
+
+def sequential_enrichment_events(input_text, enrichment_mode):
+    """Generate the whole skeleton, then enrich its topics.
+    
+    Returns (enriched_path, failed_topics), or (None, None) if no skeleton could be generated.
+    """
+    basic_path = generate_basic_path(input_text)
+    if not basic_path or not basic_path.get("topics"):
+        return None, None
+    yield {"event": "skeleton", "cached": False, "learning_path": basic_path}
+    
+    enriched_path = basic_path.copy()
+    failed_topics = []
+    for i, details, succeeded in iter_enriched_topics(basic_path, enrichment_mode):
+        enriched_path['topics'][i].update(details)
+        if not succeeded:
+            failed_topics.append(i)
+        yield {"event": "topic", "index": i, "topic": enriched_path['topics'][i]}
+    
+    return enriched_path, sorted(failed_topics)
+
+def pipelined_enrichment_events(input_text, enrichment_mode):
+    """Stream the skeleton from Bedrock and start enriching each topic as soon as it is complete.
+    
+    In batched mode the topics are still shown as they arrive, but are enriched
+    together in one call once the skeleton is complete.
+    
+    Returns (enriched_path, failed_topics), or (None, None) if no skeleton could be generated.
+    """
+    parser = TopicStreamParser()
+    enrichment = None
+    outlines = {}
+    raw_chunks = []
+    failed_topics = []
+    
+    def merge(results):
+        for i, details, succeeded in results:
+            outlines[i].update(details)
+            if not succeeded:
+                failed_topics.append(i)
+            yield {"event": "topic", "index": i, "topic": outlines[i]}
+    
+    for text in stream_bedrock_model(basic_path_request(input_text), "basic_path"):
+        raw_chunks.append(text)
+        for i, topic in parser.feed(text):
+            if enrichment is None:
+                path_title = (parser.header or {}).get('title') or input_text
+                enrichment = TopicEnrichment(path_title)
+                yield {"event": "skeleton", "cached": False, "learning_path": {**(parser.header or {}), "topics": []}}
+            outlines[i] = topic
+            if enrichment_mode != 'batched':
+                enrichment.submit(i, topic)
+            yield {"event": "topic_outline", "index": i, "topic": topic}
+        if enrichment is not None:
+            yield from merge(enrichment.iter_ready())
+    
+    # The full text is still parsed so that header fields after the topics array are kept
+    raw_response = ''.join(raw_chunks)
+    log_sampled("Raw basic path response: %s", raw_response)
+    basic_path = parse_json_response(raw_response)
+    if not isinstance(basic_path, dict) or not isinstance(basic_path.get('topics'), list):
+        if not outlines:
+            return None, None
+        basic_path = {**(parser.header or {}), "topics": [outlines[i] for i in sorted(outlines)]}
+    if not basic_path.get('topics'):
+        return None, None
+    
+    # Topics the incremental parser could not pick out are enriched now
+    if enrichment is None:
+        enrichment = TopicEnrichment(basic_path.get('title') or input_text)
+        yield {"event": "skeleton", "cached": False, "learning_path": basic_path}
+    for i, topic in enumerate(basic_path['topics']):
+        if i not in outlines:
+            outlines[i] = topic
+            if enrichment_mode != 'batched':
+                enrichment.submit(i, topic)
+    if enrichment_mode == 'batched':
+        enrichment.submit_batch([(i, outlines[i]) for i in range(len(basic_path['topics']))])
+    yield from merge(enrichment.iter_results())
+    
+    enriched_path = {**basic_path, "topics": [outlines[i] for i in range(len(basic_path['topics']))]}
+    return enriched_path, sorted(failed_topics)
+
+# Learning path jobs: generation runs on a local worker pool and clients poll for the result,
+# so no HTTP connection has to stay open for the whole Bedrock pipeline
+job_executor = None
+job_executor_lock = threading.Lock()
+
+def get_job_executor():
+    """Return the shared job worker pool, creating it if needed"""
+    global job_executor
+    if job_executor is None:
+        with job_executor_lock:
+            if job_executor is None:
+                job_executor = ThreadPoolExecutor(
+                    max_workers=app.config['JOB_WORKERS'],
+                    thread_name_prefix='learning-path-job'
+                )
+    return job_executor
+
+def serialize_job(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": {
+            "topics_total": job.topics_total,
+            "topics_done": job.topics_done
+        },
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "updated_at": job.updated_at.isoformat(),
+        "status_url": f"/api/learning-path-jobs/{job.id}",
+        "result_url": f"/api/learning-path-jobs/{job.id}/result"
+    }
+
+@app.route('/api/learning-path-jobs', methods=['POST'])
+def submit_learning_path_job():
+    data = request.get_json()
+    if not data or 'prompt' not in data:
+        return jsonify({"error": "No input prompt provided"}), 400
+    
+    enrichment_mode = data.get('enrichment_mode', app.config['ENRICHMENT_MODE'])
+    if enrichment_mode not in ENRICHMENT_MODES:
+        return jsonify({"error": f"enrichment_mode must be one of {', '.join(ENRICHMENT_MODES)}"}), 400
+    
+    job = LearningPathJob(id=str(uuid.uuid4()), prompt=data['prompt'], enrichment_mode=enrichment_mode)
+    db.session.add(job)
+    db.session.commit()
+    
+    get_job_executor().submit(run_learning_path_job, job.id)
+    return jsonify(serialize_job(job)), 202
+
+@app.route('/api/learning-path-jobs/<job_id>', methods=['GET'])
+def get_learning_path_job(job_id):
+    job = db.session.get(LearningPathJob, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(serialize_job(job))
+
+@app.route('/api/learning-path-jobs/<job_id>/result', methods=['GET'])
+def get_learning_path_job_result(job_id):
+    job = db.session.get(LearningPathJob, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status == 'succeeded':
+        return app.response_class(job.result, mimetype='application/json')
+    if job.status == 'failed':
+        return jsonify({"status": "error", "message": job.error}), 500
+    # Not finished yet: point the client back at the status endpoint
+    return jsonify(serialize_job(job)), 202, {'Retry-After': '2'}
+
+def claim_learning_path_job(job_id):
+    """Atomically move a queued job to running; False if another worker got it first"""
+    now = datetime.utcnow()
+    claimed = LearningPathJob.query.filter_by(id=job_id, status='queued').update(
+        {"status": "running", "stage": "basic_path", "updated_at": now},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return claimed == 1
+
+def run_learning_path_job(job_id):
+    """Worker entry point: run the generation pipeline for a job, recording progress per stage"""
+    with app.app_context():
+        try:
+            if not claim_learning_path_job(job_id):
+                return
+            job = db.session.get(LearningPathJob, job_id)
+            
+            def update(**fields):
+                for name, value in fields.items():
+                    setattr(job, name, value)
+                job.updated_at = datetime.utcnow()
+                db.session.commit()
+            
+            for event in generate_learning_path_events(job.prompt, job.enrichment_mode):
+                kind = event["event"]
+                if kind == "skeleton":
+                    update(stage="enrichment", topics_total=len(event["learning_path"].get("topics", [])))
+                elif kind == "topic_outline":
+                    update(topics_total=max(job.topics_total, event["index"] + 1))
+                elif kind == "topic":
+                    update(topics_done=job.topics_done + 1, topics_total=max(job.topics_total, event["index"] + 1))
+                elif kind == "flowchart":
+                    update(stage="validation")
+                elif kind == "complete":
+                    payload = {key: value for key, value in event.items() if key != "event"}
+                    update(status="succeeded", stage="done", result=json.dumps(payload))
+                    return
+                elif kind == "error":
+                    update(status="failed", stage="done", error=event["message"])
+                    return
+            update(status="failed", stage="done", error="Learning path pipeline finished without a result")
+        except Exception as e:
+            print(f"Learning path job {job_id} failed: {e}")
+            db.session.rollback()
+            LearningPathJob.query.filter_by(id=job_id).update(
+                {"status": "failed", "stage": "done", "error": str(e), "updated_at": datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.session.commit()
+
+def requeue_stale_learning_path_jobs(stale_before):
+    """Move running jobs whose progress stopped before stale_before back to the queue"""
+    LearningPathJob.query.filter(
+        LearningPathJob.status == 'running',
+        LearningPathJob.updated_at < stale_before
+    ).update({"status": "queued", "stage": "queued"}, synchronize_session=False)
+    db.session.commit()
+
+def resume_learning_path_jobs():
+    """Requeue jobs left unfinished by a previous process, hand them to the worker pool
+    and start the stale-job sweeper.
+    
+    A running job whose progress has not been updated for JOB_STALE_AFTER seconds
+    belonged to a process that died; other live workers' jobs are left alone. Jobs
+    interrupted moments before a restart are not stale yet; the sweeper requeues them
+    once they are.
+    """
+    with app.app_context():
+        requeue_stale_learning_path_jobs(datetime.utcnow() - timedelta(seconds=app.config['JOB_STALE_AFTER']))
+        job_ids = [job_id for (job_id,) in LearningPathJob.query.filter_by(status='queued').with_entities(LearningPathJob.id)]
+    for job_id in job_ids:
+        get_job_executor().submit(run_learning_path_job, job_id)
+    start_job_sweeper()
+    return len(job_ids)
+
+def sweep_learning_path_jobs():
+    """Requeue and resubmit jobs that have made no progress for JOB_STALE_AFTER seconds.
+    
+    That covers running jobs whose process stopped and queued jobs that no process
+    picked up. A job that is still queued here is claimed only once.
+    """
+    with app.app_context():
+        stale_before = datetime.utcnow() - timedelta(seconds=app.config['JOB_STALE_AFTER'])
+        requeue_stale_learning_path_jobs(stale_before)
+        job_ids = [job_id for (job_id,) in LearningPathJob.query.filter(
+            LearningPathJob.status == 'queued',
+            LearningPathJob.updated_at < stale_before
+        ).with_entities(LearningPathJob.id)]
+    for job_id in job_ids:
+        print(f"Resubmitting stalled learning path job {job_id}")
+        get_job_executor().submit(run_learning_path_job, job_id)
+    return len(job_ids)
+
+job_sweeper = None
+job_sweeper_lock = threading.Lock()
+
+def start_job_sweeper():
+    """Run sweep_learning_path_jobs every JOB_STALE_AFTER / 2 seconds for the life of the process"""
+    global job_sweeper
+    with job_sweeper_lock:
+        if job_sweeper is not None:
+            return
+        
+        def run():
+            while True:
+                time.sleep(app.config['JOB_STALE_AFTER'] / 2)
+                try:
+                    sweep_learning_path_jobs()
+                except Exception as e:
+                    print(f"Learning path job sweep failed: {e}")
+        
+        job_sweeper = threading.Thread(target=run, name='learning-path-job-sweeper', daemon=True)
+        job_sweeper.start()
+
+def basic_path_request(input_text):
+    """Bedrock request body for the basic path structure"""
+    if compact_prompts():
+        system_prompt = (
+            'Respond ONLY with valid JSON: {"title":"short title","overview":"1-2 sentences",'
+            '"total_duration":"X weeks/months","topics":[{"name":"Topic Name","duration":"X days/weeks",'
+            '"description":"brief"}]}. 3-4 key topics maximum, concise text.'
+        )
+        return basic_path_body(system_prompt, input_text)
+    
+    # Simplified system prompt focusing on core structure
+    system_prompt = """You MUST respond with valid JSON for a learning path with these fields:
+{
+  "title": "Short, concise title",
+  "overview": "Very brief description (1-2 sentences)",
+  "total_duration": "X weeks/months",
+  "topics": [
+    {
+      "name": "Topic Name",
+      "duration": "X days/weeks",
+      "description": "Brief description"
+    }
+  ]
+}
+
+IMPORTANT RULES:
+1. Keep descriptions SHORT and CONCISE
+2. Include only 3-4 key topics maximum
+3. ONLY respond with valid JSON, nothing else"""
+
+    return basic_path_body(system_prompt, input_text)
+
+def basic_path_body(system_prompt, input_text):
+    # max_tokens is filled in from the template's budget when the request is sent
+    return {
+        "anthropic_version": "bedrock-2023-05-31",
+        "temperature": 0.2,
+        "system": system_prompt,
+        "messages": [{
+            "role": "user", 
+            "content": f"Create a concise learning path for: {input_text}. Focus on core topics only."
+        }]
+    }
+
+def generate_basic_path(input_text):
+    """Generate basic path structure with limited topics"""
+    with timed_span("generate_basic_path"):
+        response_body = invoke_bedrock_model(basic_path_request(input_text), "basic_path")
+        raw_response = response_body['content'][0]['text']
+        log_sampled("Raw basic path response: %s", raw_response)
         
-        # Connect to next topic
-        if i < len(learning_path.get('topics', [])) - 1:
-            flowchart += f"    {topic_id}_projects --> topic{i+1}\n"
+        # Parse JSON response
+        try:
+            return parse_json_response(raw_response)
+        except Exception as e:
+            print(f"Basic path generation failed: {e}")
+            return None
+
+# Shared pool for topic enrichment calls, created on first use. It is sized like the AWS
+# connection pool, since calls beyond that would only queue for a connection; each
+# learning path limits its own share of it to ENRICHMENT_MAX_WORKERS.
+enrichment_executor = None
+enrichment_executor_lock = threading.Lock()
+
+def get_enrichment_executor():
+    """Return the shared enrichment thread pool, creating it if needed"""
+    global enrichment_executor
+    if enrichment_executor is None:
+        with enrichment_executor_lock:
+            if enrichment_executor is None:
+                enrichment_executor = ThreadPoolExecutor(
+                    max_workers=app.config['AWS_MAX_POOL_CONNECTIONS'],
+                    thread_name_prefix='enrichment'
+                )
+    return enrichment_executor
+
+def default_topic_details(topic):
+    """Fallback resources, projects and study plan for a topic that could not be enriched"""
+    return {
+        "resources": [{"type": "article", "title": "Introduction to " + topic['name'], "url": "https://example.com", "estimated_time": "30 min"}],
+        "projects": [{"name": "Basic " + topic['name'] + " Project", "description": "Apply what you learned", "complexity": "beginner"}],
+        "study_plan": [{"day": "Day 1", "tasks": ["Study " + topic['name']]}]
+    }
+
+def enrich_topic(topic, path_title):
+    """Generate resources, projects and a study plan for a single topic"""
+    if compact_prompts():
+        system_prompt = (
+            f'Respond ONLY with valid JSON for the topic {json.dumps(topic["name"])}: '
+            '{"resources":[{"type":"video|article|tutorial","title":"Resource Title","url":"https://...",'
+            '"estimated_time":"X min/hours"}],"projects":[{"name":"Project Name","description":"brief",'
+            '"complexity":"beginner|intermediate|advanced"}],"study_plan":[{"day":"Day 1","tasks":["brief task"]}]}. '
+            '2-3 resources (preferably YouTube), 1-2 projects, 2-3 study days, very concise text.'
+        )
+    else:
+        # Simplified system prompt for resources and projects
+        system_prompt = f"""You MUST respond with valid JSON for learning resources and projects for the topic "{topic['name']}" with this structure:
+{{
+  "resources": [
+    {{
+      "type": "video/article/tutorial",
+      "title": "Resource Title",
+      "url": "https://example.com/resource",
+      "estimated_time": "X min/hours"
+    }}
+  ],
+  "projects": [
+    {{
+      "name": "Project Name",
+      "description": "Brief project description",
+      "complexity": "beginner/intermediate/advanced"
+    }}
+  ],
+  "study_plan": [
+    {{
+      "day": "Day 1",
+      "tasks": ["Brief task description"]
+    }}
+  ]
+}}
+
+IMPORTANT RULES:
+1. Include 2-3 resources maximum (preferably YouTube links)
+2. Include 1-2 projects maximum
+3. Include 2-3 study days maximum
+4. Keep all text VERY concise
+5. ONLY respond with valid JSON, nothing else"""
+
+    with timed_span("enrich_topic"):
+        response_body = invoke_bedrock_model({
+            "anthropic_version": "bedrock-2023-05-31",
+            "temperature": 0.2,
+            "system": system_prompt,
+            "messages": [{
+                "role": "user", 
+                "content": f"Create learning resources and projects for the topic '{topic['name']}' in the context of {path_title}."
+            }]
+        }, "enrich_topic")
+        raw_response = response_body['content'][0]['text']
+        log_sampled("Raw enrichment response: %s", raw_response)
+        
+        topic_details = parse_json_response(raw_response)
+        if not topic_details:
+            raise ValueError("Model response could not be parsed as JSON")
+        
+        details, failed_fields = validate_topic_details(topic_details)
+        if failed_fields:
+            raise InvalidModelOutput(failed_fields)
+        return details
+
+def enrich_topics_batched(topics, path_title):
+    """Generate resources, projects and study plans for several topics in one model call.
+    
+    Returns one entry per input topic, in order: its details, or None if the
+    answer left the topic out or got its structure wrong.
+    """
+    topic_names = [topic['name'] for topic in topics]
+    if compact_prompts():
+        system_prompt = (
+            f'Respond ONLY with valid JSON with learning resources and projects for each topic in {json.dumps(topic_names)}, '
+            'with this structure: {"topics":[{"name":"Topic Name (exactly as given)","resources":[{"type":"video|article|tutorial",'
+            '"title":"Resource Title","url":"https://...","estimated_time":"X min/hours"}],"projects":[{"name":"Project Name",'
+            '"description":"brief","complexity":"beginner|intermediate|advanced"}],"study_plan":[{"day":"Day 1",'
+            '"tasks":["brief task"]}]}]}. Every topic, in the given order; per topic 2-3 resources (preferably YouTube), '
+            '1-2 projects, 2-3 study days; very concise text.'
+        )
+    else:
+        system_prompt = f"""You MUST respond with valid JSON containing learning resources and projects for each topic in {json.dumps(topic_names)}, with this structure:
+{{
+  "topics": [
+    {{
+      "name": "Topic Name (exactly as given)",
+      "resources": [
+        {{
+          "type": "video/article/tutorial",
+          "title": "Resource Title",
+          "url": "https://example.com/resource",
+          "estimated_time": "X min/hours"
+        }}
+      ],
+      "projects": [
+        {{
+          "name": "Project Name",
+          "description": "Brief project description",
+          "complexity": "beginner/intermediate/advanced"
+        }}
+      ],
+      "study_plan": [
+        {{
+          "day": "Day 1",
+          "tasks": ["Brief task description"]
+        }}
+      ]
+    }}
+  ]
+}}
+
+IMPORTANT RULES:
+1. Include every topic, in the given order
+2. Include 2-3 resources maximum per topic (preferably YouTube links)
+3. Include 1-2 projects maximum per topic
+4. Include 2-3 study days maximum per topic
+5. Keep all text VERY concise
+6. ONLY respond with valid JSON, nothing else"""
+
+    with timed_span("enrich_topics_batched"):
+        response_body = invoke_bedrock_model({
+            "anthropic_version": "bedrock-2023-05-31",
+            "temperature": 0.2,
+            "system": system_prompt,
+            "messages": [{
+                "role": "user", 
+                "content": f"Create learning resources and projects for each of these topics in the context of {path_title}: {', '.join(topic_names)}."
+            }]
+        }, "enrich_batch", units=len(topics))
+        raw_response = response_body['content'][0]['text']
+        log_sampled("Raw batched enrichment response: %s", raw_response)
+        
+        batch = parse_json_response(raw_response)
+    answered = batch.get('topics') if isinstance(batch, dict) else None
+    if not isinstance(answered, list):
+        raise ValueError("Batched response has no topics array")
+    
+    # Match answers to topics by name, falling back to position when the model renamed a topic
+    by_name = {
+        normalize_prompt(item['name']): item
+        for item in answered if isinstance(item, dict) and isinstance(item.get('name'), str)
+    }
+    results = []
+    for position, name in enumerate(topic_names):
+        item = by_name.get(normalize_prompt(name))
+        if item is None and position < len(answered) and len(answered) == len(topic_names):
+            item = answered[position]
+        details, failed_fields = validate_topic_details(item)
+        results.append(None if failed_fields else details)
+    return results
+
+class TopicEnrichment:
+    """In-flight enrichment of the topics of one learning path.
+    
+    Topics can be submitted one at a time as they become known, or together as
+    one batched model call. Topics found in the topic cache complete immediately
+    without a model call; the rest run on the shared enrichment pool, at most
+    ENRICHMENT_MAX_WORKERS at a time for this learning path. A topic
+    whose answer raises or fails validation is re-requested on its own, up to
+    ENRICHMENT_RETRIES times, before it completes with its default details; a
+    topic that runs longer than ENRICHMENT_TIMEOUT gets its defaults straight
+    away. Topics a batched call leaves out or gets wrong are retried one by one.
+    """
+    
+    def __init__(self, path_title):
+        self.path_title = path_title
+        self.timeout = app.config['ENRICHMENT_TIMEOUT']
+        self.topics = {}
+        self.started = {}
+        self.retries = {}
+        self.max_running = app.config['ENRICHMENT_MAX_WORKERS']
+        # Future -> topic index, or a tuple of indices for a batched call
+        self.pending = {}
+        # Calls waiting for one of this learning path's slots on the pool
+        self.waiting = deque()
+        self.ready = []
+    
+    def submit(self, i, topic):
+        if self.use_cached(i, topic):
+            return
+        self.submit_single(i)
+    
+    def submit_batch(self, items):
+        misses = [i for i, topic in items if not self.use_cached(i, topic)]
+        if len(misses) == 1:
+            self.submit_single(misses[0])
+        elif misses:
+            self.start(self.run_batch, tuple(misses))
+    
+    def use_cached(self, i, topic):
+        self.topics[i] = topic
+        cached = topic_cache.get(topic['name'], self.path_title)
+        if cached is not None:
+            self.ready.append((i, cached, True))
+        return cached is not None
+    
+    def submit_single(self, i):
+        self.start(self.run, i)
+    
+    def start(self, fn, key):
+        self.waiting.append((fn, key))
+        self.start_waiting()
+    
+    def start_waiting(self):
+        while self.waiting and len(self.pending) < self.max_running:
+            fn, key = self.waiting.popleft()
+            self.pending[get_enrichment_executor().submit(fn, key)] = key
+    
+    def run(self, i):
+        # The timeout counts from when a worker picks the topic up, not from submission
+        self.started[i] = time.monotonic()
+        return enrich_topic(self.topics[i], self.path_title)
+    
+    def run_batch(self, key):
+        self.started[key] = time.monotonic()
+        return enrich_topics_batched([self.topics[i] for i in key], self.path_title)
+    
+    def collect(self, future):
+        key = self.pending.pop(future)
+        if isinstance(key, tuple):
+            self.collect_batch(future, key)
+            return
+        topic = self.topics[key]
+        try:
+            details = future.result()
+        except Exception as e:
+            # Only this topic is asked for again; the rest of the path is unaffected
+            if self.retries.get(key, 0) < app.config['ENRICHMENT_RETRIES']:
+                self.retries[key] = self.retries.get(key, 0) + 1
+                print(f"Topic enrichment failed for {topic['name']}, retrying: {e}")
+                self.submit_single(key)
+                return
+            print(f"Topic enrichment failed for {topic['name']}: {e}")
+            self.ready.append((key, default_topic_details(topic), False))
+            return
+        topic_cache.put(topic['name'], self.path_title, details)
+        self.ready.append((key, details, True))
+    
+    def collect_batch(self, future, key):
+        try:
+            batch_details = future.result()
+        except Exception as e:
+            print(f"Batched topic enrichment failed, retrying topics individually: {e}")
+            batch_details = [None] * len(key)
+        for i, details in zip(key, batch_details):
+            if details is None:
+                self.submit_single(i)
+            else:
+                topic_cache.put(self.topics[i]['name'], self.path_title, details)
+                self.ready.append((i, details, True))
+    
+    def expire_overdue(self):
+        """Give up on topics that have been running past their deadline"""
+        now = time.monotonic()
+        for future, key in list(self.pending.items()):
+            if key in self.started and now - self.started[key] >= self.timeout:
+                self.pending.pop(future)
+                future.cancel()
+                for i in (key if isinstance(key, tuple) else (key,)):
+                    print(f"Topic enrichment timed out for {self.topics[i]['name']}")
+                    self.ready.append((i, default_topic_details(self.topics[i]), False))
+    
+    def iter_ready(self):
+        """Yield (index, details, succeeded) for every topic finished so far, without blocking"""
+        for future in [future for future in self.pending if future.done()]:
+            self.collect(future)
+        self.expire_overdue()
+        self.start_waiting()
+        while self.ready:
+            yield self.ready.pop(0)
+    
+    def iter_results(self):
+        """Yield (index, details, succeeded) for every remaining topic as each one finishes"""
+        yield from self.iter_ready()
+        while self.pending:
+            now = time.monotonic()
+            deadlines = [self.started[key] + self.timeout for key in self.pending.values() if key in self.started]
+            wait_for = max(0, min(deadlines) - now) if deadlines else self.timeout
+            wait(self.pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            yield from self.iter_ready()
+
+def iter_enriched_topics(basic_path, enrichment_mode='per_topic'):
+    """Enrich all topics concurrently, yielding (index, details, succeeded) as each one finishes"""
+    enrichment = TopicEnrichment(basic_path['title'])
+    if enrichment_mode == 'batched':
+        enrichment.submit_batch(list(enumerate(basic_path['topics'])))
+    else:
+        for i, topic in enumerate(basic_path['topics']):
+            enrichment.submit(i, topic)
+    yield from enrichment.iter_results()
+
+# How often each parse_json_response branch produced the result
+json_parse_metrics = {"direct": 0, "code_block": 0, "local_repair": 0, "model_repair": 0, "failed": 0}
+json_parse_metrics_lock = threading.Lock()
+
+def record_json_parse(branch, started):
+    stage_duration.observe(time.perf_counter() - started, stage="parse_json_response", outcome="ok", branch=branch)
+    with json_parse_metrics_lock:
+        json_parse_metrics[branch] += 1
+
+def parse_json_response(raw_response):
+    """Try multiple methods to parse JSON from the response"""
+    started = time.perf_counter()
+    # Direct JSON parse
+    try:
+        result = json.loads(raw_response)
+        record_json_parse("direct", started)
+        return result
+    except json.JSONDecodeError:
+        pass
+    
+    # Extract JSON from markdown code block
+    try:
+        json_match = re.search(r'```(?:json)?\n(.*?)\n```', raw_response, re.DOTALL)
+        if json_match:
+            result = json.loads(json_match.group(1))
+            record_json_parse("code_block", started)
+            return result
+    except Exception:
+        pass
+    
+    # Attempt a local repair before paying for another model call
+    result = repair_json_locally(raw_response)
+    if result is not None:
+        record_json_parse("local_repair", started)
+        return result
+    
+    # Attempt repair
+    try:
+        result = repair_json_response(raw_response)
+        record_json_parse("model_repair", started)
+        return result
+    except Exception:
+        pass
+    
+    record_json_parse("failed", started)
+    return None
+
+SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '„': '"', '‘': "'", '’': "'"})
+JSON_STRING_ESCAPES = {'\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+def repair_json_locally(raw_text):
+    """Deterministically fix the usual defects in model JSON output.
+    
+    Handles smart quotes, prose before or after the JSON, raw newlines inside
+    strings, trailing commas, stray closing brackets and output truncated at
+    max_tokens (unterminated strings and unclosed objects/arrays; a truncated
+    last member is dropped if closing it is not enough). Returns None if the
+    text still does not parse.
+    """
+    text = raw_text.translate(SMART_QUOTES)
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts:
+        return None
+    
+    out = []
+    stack = []
+    in_string = False
+    escaped = False
+    # Output length and open brackets at every comma, used to drop a truncated last member
+    checkpoints = []
+    
+    for ch in text[min(starts):]:
+        if in_string:
+            if escaped:
+                escaped = False
+                out.append(ch)
+            elif ch == '\\':
+                escaped = True
+                out.append(ch)
+            elif ch == '"':
+                in_string = False
+                out.append(ch)
+            elif ch in JSON_STRING_ESCAPES:
+                out.append(JSON_STRING_ESCAPES[ch])
+            elif ord(ch) < 0x20:
+                out.append(f'\\u{ord(ch):04x}')
+            else:
+                out.append(ch)
+            continue
+        
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+            out.append(ch)
+        elif ch in '}]':
+            if not stack or stack[-1] != ch:
+                continue  # Stray closer
+            strip_trailing_comma(out)
+            out.append(stack.pop())
+            if not stack:
+                break  # Anything after the top-level value is prose
+        elif ch == ',':
+            checkpoints.append((len(out), list(stack)))
+            out.append(ch)
         else:
-            flowchart += f"    {topic_id}_projects --> complete\n"
+            out.append(ch)
     
-    # Add completion node
-    total_duration = learning_path.get('total_duration', 'Several weeks')
-    flowchart += f"    complete([\"Complete! Total: {total_duration}\"])\n"
+    if not stack:
+        candidates = [out]
+    else:
+        # Truncated output: close what is open, then retry without each trailing member in turn
+        if escaped:
+            out.pop()
+        if in_string:
+            out.append('"')
+        candidates = [close_json(out, stack)]
+        for length, open_stack in reversed(checkpoints[-5:]):
+            candidates.append(close_json(out[:length], open_stack))
     
-    # Add styling
-    flowchart += "    classDef topic fill:#f9f7ed,stroke:#333,stroke-width:1px;\n"
-    flowchart += "    classDef milestone fill:#e8f4ea,stroke:#333,stroke-width:1px,stroke-dasharray: 5 5;\n"
-    flowchart += "    class title,complete milestone;\n"
-    flowchart += "    class " + ",".join([f"topic{i}" for i in range(len(learning_path.get('topics', [])))]) + " topic;\n"
+    for candidate in candidates:
+        try:
+            return json.loads(''.join(candidate))
+        except json.JSONDecodeError:
+            continue
+    return None
+
+def strip_trailing_comma(out):
+    """Drop trailing whitespace and a dangling comma from a list of output characters"""
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+
+def close_json(out, stack):
+    """Return a copy of the output with every open object and array closed"""
+    closed = list(out)
+    strip_trailing_comma(closed)
+    if closed and closed[-1] == ':':
+        closed.append('null')
+    closed.extend(reversed(stack))
+    return closed
+
+# Learning path schema validation. Schemas are compiled once into nested check functions;
+# validating a response is then a single walk that normalizes values, fills defaults and
+# collects every field that failed, so callers can act on exactly the parts that are wrong.
+MISSING = object()
+
+class InvalidModelOutput(ValueError):
+    """A model answer parsed as JSON but failed schema validation"""
     
-    return flowchart
+    def __init__(self, failed_fields):
+        self.failed_fields = failed_fields
+        super().__init__("Invalid fields: " + ", ".join(failure["field"] for failure in failed_fields))
+
+def format_field_path(path):
+    text = ""
+    for part in path:
+        text += f"[{part}]" if isinstance(part, int) else (f".{part}" if text else part)
+    return text
+
+def record_failure(failures, path, problem):
+    failures.append({"field": format_field_path(path), "path": list(path), "problem": problem})
+
+def resolve_default(default, path):
+    """Defaults may be callables of the field path, and are copied so responses never share them"""
+    if callable(default):
+        return default(path)
+    return json.loads(json.dumps(default)) if isinstance(default, (dict, list)) else default
+
+def string_field(required=False, default=MISSING, normalize=None):
+    """Check for a non-empty string, trimmed and passed through normalize (which raises ValueError to reject it)"""
+    def check(value, path, failures):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        if isinstance(value, str) and value.strip():
+            try:
+                return normalize(value.strip()) if normalize else value.strip()
+            except ValueError as e:
+                problem = str(e)
+        else:
+            problem = "missing" if value is MISSING else "expected a non-empty string"
+        if required:
+            record_failure(failures, path, problem)
+        return resolve_default(default, path)
+    return check
+
+def object_field(fields, required=False, default=MISSING):
+    """Check an object field by field, keeping any keys the schema does not mention"""
+    checks = tuple(fields.items())
+    def check(value, path, failures):
+        if not isinstance(value, dict):
+            if required:
+                record_failure(failures, path, "missing" if value is MISSING else "expected an object")
+            return resolve_default(default, path)
+        result = dict(value)
+        for name, field_check in checks:
+            checked = field_check(value.get(name, MISSING), path + (name,), failures)
+            if checked is MISSING:
+                result.pop(name, None)
+            else:
+                result[name] = checked
+        return result
+    return check
+
+def list_field(items, required=False, default=MISSING, min_items=0, drop_invalid=True):
+    """Check every element of a list; unless drop_invalid is off, elements that fail their own checks are dropped"""
+    def check(value, path, failures):
+        if not isinstance(value, list):
+            if required:
+                record_failure(failures, path, "missing" if value is MISSING else "expected a list")
+            return resolve_default(default, path)
+        result = []
+        for i, item in enumerate(value):
+            item_failures = []
+            checked = items(item, path + (i,), item_failures)
+            failures.extend(item_failures)
+            if checked is not MISSING and not (drop_invalid and item_failures):
+                result.append(checked)
+        if len(result) < min_items:
+            if required:
+                record_failure(failures, path, f"expected at least {min_items} valid item(s)")
+            return resolve_default(default, path) if default is not MISSING else result
+        return result
+    return check
+
+DURATION_UNITS = {
+    "min": "minute", "mins": "minute", "minute": "minute", "minutes": "minute",
+    "h": "hour", "hr": "hour", "hrs": "hour", "hour": "hour", "hours": "hour",
+    "d": "day", "day": "day", "days": "day",
+    "w": "week", "wk": "week", "wks": "week", "week": "week", "weeks": "week",
+    "mo": "month", "month": "month", "months": "month"
+}
+DURATION_PATTERN = re.compile(
+    r"(\d+(?:\.\d+)?)\s*(?:(?:-|–|to)\s*(\d+(?:\.\d+)?)\s*)?([a-z]+)\.?",
+    re.IGNORECASE
+)
+
+def normalize_duration(text):
+    """Write simple durations one way ("2-3 weeks", "1 day", "30 minutes"); anything else is kept as given"""
+    match = DURATION_PATTERN.fullmatch(text)
+    unit = DURATION_UNITS.get(match.group(3).lower()) if match else None
+    if unit is None:
+        return text
+    low, high = match.group(1), match.group(2)
+    amount = f"{low}-{high}" if high else low
+    return f"{amount} {unit}" if amount == "1" else f"{amount} {unit}s"
 
-# Modify the validate_and_enhance_response function to include the flowchart
-def validate_and_enhance_response(learning_path):
-    """Validate and add missing structure to the response"""
+def convert_to_embed_url(url):
+    """Convert YouTube URL to embed format"""
+    parts = urlsplit(url)
+    host = parts.netloc.lower().removeprefix('www.').removeprefix('m.')
+    video_id = None
+    # Handle standard YouTube URLs, wherever v= sits in the query
+    if host == 'youtube.com' and parts.path == '/watch':
+        video_id = parse_qs(parts.query).get('v', [None])[0]
+    # Handle Shorts and live URLs
+    elif host == 'youtube.com' and parts.path.startswith(('/shorts/', '/live/')):
+        video_id = parts.path.split('/')[2]
+    # Handle youtu.be shortened URLs
+    elif host == 'youtu.be':
+        video_id = parts.path.lstrip('/').split('/')[0]
+    # Already an embed URL or not a YouTube URL
+    return f"https://www.youtube.com/embed/{video_id}" if video_id else url
+
+def normalize_resource_url(url):
+    """Absolute http(s) URL, with YouTube links converted to their embed form"""
+    if '://' not in url and re.match(r'(www\.)?[\w-]+(\.[\w-]+)+(/|$)', url):
+        url = f"https://{url}"
+    if urlsplit(url).scheme not in ('http', 'https') or not urlsplit(url).netloc:
+        raise ValueError("expected an http(s) URL")
+    return convert_to_embed_url(url)
+
+RESOURCE_SCHEMA = object_field({
+    "title": string_field(required=True),
+    "url": string_field(required=True, normalize=normalize_resource_url),
+    "type": string_field(default="article"),
+    "estimated_time": string_field(normalize=normalize_duration)
+}, required=True)
+
+PROJECT_SCHEMA = object_field({
+    "name": string_field(required=True),
+    "description": string_field(default=""),
+    "complexity": string_field(default="intermediate", normalize=str.lower)
+}, required=True)
+
+STUDY_DAY_SCHEMA = object_field({
+    "day": string_field(required=True),
+    "tasks": list_field(string_field(required=True), required=True, min_items=1)
+}, required=True)
+
+def topic_detail_fields(with_defaults):
+    """Enrichment fields of a topic. Without defaults they only validate, for checking a model answer;
+    with them a complete response is always produced, while the failures still say what was wrong."""
+    return {
+        "resources": list_field(RESOURCE_SCHEMA, required=True, min_items=1, default=[] if with_defaults else MISSING),
+        "projects": list_field(PROJECT_SCHEMA, required=True, default=[{
+            'name': 'Practical Application',
+            'description': 'Apply what you learned',
+            'complexity': 'intermediate'
+        }] if with_defaults else MISSING),
+        "study_plan": list_field(STUDY_DAY_SCHEMA, required=True, default=[{
+            'day': 'Day 1',
+            'tasks': ['Study core concepts']
+        }] if with_defaults else MISSING)
+    }
+
+TOPIC_DETAILS_SCHEMA = object_field(topic_detail_fields(with_defaults=False), required=True)
+
+LEARNING_PATH_SCHEMA = object_field({
+    "title": string_field(default='Custom Learning Path'),
+    "overview": string_field(default=''),
+    "total_duration": string_field(default='4-6 weeks', normalize=normalize_duration),
+    "topics": list_field(object_field({
+        "name": string_field(required=True, default=lambda path: f"Topic {path[-2] + 1}"),
+        "duration": string_field(default='1 week', normalize=normalize_duration),
+        "description": string_field(default=''),
+        **topic_detail_fields(with_defaults=True)
+    }, required=True), required=True, default=[], drop_invalid=False)
+}, required=True)
+
+def validate_topic_details(item):
+    """Validate a model's enrichment answer for one topic; returns (details, failed fields)"""
+    failures = []
+    details = TOPIC_DETAILS_SCHEMA(item, (), failures)
+    if failures:
+        return None, failures
+    return {name: details[name] for name in ("resources", "projects", "study_plan")}, failures
+
+def validate_learning_path(learning_path):
+    """Validate and normalize a complete learning path; returns (learning path, failed fields)"""
     if not isinstance(learning_path, dict):
         raise ValueError("Response is not a JSON object")
+    failures = []
+    return LEARNING_PATH_SCHEMA(learning_path, (), failures), failures
+
+def repair_json_response(raw_text):
+    """Use AI to repair malformed JSON responses"""
+    with timed_span("repair_json_response"):
+        response_body = invoke_bedrock_model({
+            "anthropic_version": "bedrock-2023-05-31",
+            "temperature": 0,
+            "system": "You are a helpful assistant who can fix malformed JSON responses.",
+            "messages": [{
+                "role": "user", 
+                "content": f"Repair this malformed JSON: {raw_text}"
+            }]
+        }, "json_repair", min_tokens=math.ceil(len(raw_text) / 3))  # Room for the whole text back, at ~3 characters a token
+        return json.loads(response_body['content'][0]['text'])
+
+
+@app.route('/api/save-learning-path', methods=['POST'])
+def save_learning_path():
+    try:
+        data = request.get_json()
+        
+        # Validate input data
+        if not data or 'learning_path' not in data:
+            return jsonify({"error": "No learning path data provided"}), 400
+        
+        # Extract data
+        learning_path = data.get('learning_path')
+        user_id = data.get('userId', 'anonymous')
+        if not isinstance(learning_path, dict):
+            return jsonify({"error": "learning_path must be a JSON object"}), 400
+        
+        # The path ID is assigned here so that async and batched writes can report it straight away
+        item = {
+            'path_id': str(uuid.uuid4()),
+            'user_id': str(user_id),
+            'created_at': datetime.utcnow().isoformat(),
+            'learning_path': learning_path
+        }
+        backend = get_storage_backend()
+        write_mode = app.config['STORAGE_WRITE_MODE']
+        
+        if write_mode == 'sync':
+            path_details = save_and_index(backend, item)
+            return jsonify({
+                'status': 'success',
+                'message': 'Learning path stored successfully',
+                'path_details': path_details
+            }), 200
+        
+        if write_mode == 'batched':
+            get_storage_batcher().add(item)
+        else:
+            get_storage_executor().submit(save_in_background, backend, [item])
+        record_storage_metric("queued")
+        return jsonify({
+            'status': 'accepted',
+            'message': 'Learning path queued for storage',
+            'path_details': {
+                'path_id': item['path_id'],
+                'storage_location': backend.location(item),
+                'created_at': item['created_at']
+            }
+        }), 202
+    
+    except ClientError as e:
+        print(f"AWS client error: {str(e)}")
+        return jsonify({"error": f"AWS error: {str(e)}"}), 500
+    except Exception as e:
+        print(f"Error in save_learning_path: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+class LambdaStorageBackend:
+    """Stores learning paths through the aiws-lambda function, which writes them to S3"""
+    
+    def location(self, item):
+        return f"s3://{app.config['STORAGE_BUCKET']}/learning-paths/{item['user_id']}/{item['path_id']}/"
+    
+    def save(self, item):
+        # Prepare the payload for Lambda
+        lambda_payload = {'body': item}
+        status_code, response_payload = invoke_storage_lambda(lambda_payload)
+        if status_code != 200 or response_payload.get('statusCode') != 200:
+            raise RuntimeError(f"Failed to store learning path: {response_payload.get('body')}")
+        return json.loads(response_payload['body'])['path_details']
+    
+    def save_many(self, items):
+        # One invocation per batch; the Lambda writes the items concurrently and reports each one
+        status_code, response_payload = invoke_storage_lambda({'body': {'learning_paths': items}})
+        if status_code != 200 or response_payload.get('statusCode') != 200:
+            raise RuntimeError(f"Failed to store learning paths: {response_payload.get('body')}")
+        return [
+            result['path_details'] if result['status'] == 'success'
+            else RuntimeError(f"Failed to store learning path {result.get('path_id')}: {result.get('error')}")
+            for result in json.loads(response_payload['body'])['results']
+        ]
+    
+    def load(self, user_id, path_id):
+        # The Lambda writes to the shared bucket, so reads go straight to S3
+        return S3StorageBackend().load(user_id, path_id)
+
+class S3StorageBackend:
+    """Writes learning paths straight to S3 through the pooled client, skipping the Lambda hop.
     
-    # Required fields with defaults
-    learning_path.setdefault('title', 'Custom Learning Path')
-    learning_path.setdefault('overview', '')
-    learning_path.setdefault('total_duration', '4-6 weeks')
+    Objects use the same key and layout as the Lambda, so either backend can read
+    what the other wrote.
+    """
     
-    # Ensure topics array exists
-    if not isinstance(learning_path.get('topics'), list):
-        learning_path['topics'] = []
+    def key(self, item):
+        return f"learning-paths/{item['user_id']}/{item['path_id']}/complete_data.json"
     
-    # Enhance each topic
-    for i, topic in enumerate(learning_path['topics']):
-        topic.setdefault('name', f'Topic {i+1}')
-        topic.setdefault('duration', '1 week')
-        topic.setdefault('description', '')
+    def load(self, user_id, path_id):
+        with checkout_aws_client('s3', app.config['STORAGE_S3_REGION']) as s3:
+            response = s3.get_object(
+                Bucket=app.config['STORAGE_BUCKET'],
+                Key=self.key({'user_id': user_id, 'path_id': path_id})
+            )
+            body = response['Body'].read()
+        # Objects written before compression was introduced carry no encoding and load as plain JSON
+        content_encoding = response.get('ContentEncoding') or response.get('Metadata', {}).get('content-encoding', 'identity')
+        return decode_storage_body(body, content_encoding)
+    
+    def location(self, item):
+        return f"s3://{app.config['STORAGE_BUCKET']}/learning-paths/{item['user_id']}/{item['path_id']}/"
+    
+    def save(self, item):
+        body, content_encoding = serialize_storage_object(build_storage_object(item))
+        put_args = {
+            'Bucket': app.config['STORAGE_BUCKET'],
+            'Key': self.key(item),
+            'Body': body,
+            'ContentType': 'application/json',
+            'Metadata': {'content-encoding': content_encoding}
+        }
+        if content_encoding != 'identity':
+            put_args['ContentEncoding'] = content_encoding
+        with checkout_aws_client('s3', app.config['STORAGE_S3_REGION']) as s3:
+            s3.put_object(**put_args)
+        return {
+            'path_id': item['path_id'],
+            'storage_location': self.location(item),
+            'created_at': item['created_at'],
+            'size_bytes': len(body)
+        }
+    
+    def save_many(self, items):
+        # Puts are independent, so a batch is written concurrently over the pooled connections.
+        # Batches already run on the storage write pool, so the puts get a pool of their own.
+        return list(get_storage_put_executor().map(lambda item: save_outcome(self.save, item), items))
+
+class LocalStorageBackend:
+    """Writes learning paths under STORAGE_LOCAL_DIR, for development and offline runs"""
+    
+    def path(self, item):
+        # User IDs come from the client, so keep them from escaping the storage directory
+        user_dir = re.sub(r'[^A-Za-z0-9_.-]', '_', item['user_id']).lstrip('.') or 'anonymous'
+        return os.path.join(app.config['STORAGE_LOCAL_DIR'], user_dir, item['path_id'], 'complete_data.json')
+    
+    def location(self, item):
+        return f"file://{self.path(item)}"
+    
+    def save(self, item):
+        path = self.path(item)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partial object
+        temp_path = f"{path}.tmp"
+        body, _ = serialize_storage_object(build_storage_object(item))
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.replace(temp_path, path)
+        return {
+            'path_id': item['path_id'],
+            'storage_location': self.location(item),
+            'created_at': item['created_at'],
+            'size_bytes': len(body)
+        }
+    
+    def save_many(self, items):
+        return [save_outcome(self.save, item) for item in items]
+    
+    def load(self, user_id, path_id):
+        with open(self.path({'user_id': user_id, 'path_id': path_id}), 'rb') as f:
+            # Files carry no metadata, so the encoding is detected from the content
+            return decode_storage_body(f.read(), None)
+
+STORAGE_BACKENDS = {
+    'lambda': LambdaStorageBackend,
+    's3': S3StorageBackend,
+    'local': LocalStorageBackend
+}
+
+def get_storage_backend():
+    return STORAGE_BACKENDS[app.config['STORAGE_BACKEND']]()
+
+# Backends' save_many returns one outcome per item, in order: its path details, or the
+# exception that item failed with, so one bad item never hides the ones that were stored
+def save_outcome(save, item):
+    try:
+        return save(item)
+    except Exception as e:
+        return e
+
+def build_storage_object(item):
+    """The stored document: the same metadata envelope the Lambda writes"""
+    return {
+        'metadata': {
+            'path_id': item['path_id'],
+            'created_at': item['created_at'],
+            'user_id': item['user_id'],
+            'title': item['learning_path'].get('title', 'Untitled Learning Path')
+        },
+        'learning_path': item['learning_path'],
+    }
+
+def serialize_storage_object(storage_object):
+    """Encode a stored document as configured; returns (body bytes, content encoding).
+    
+    Mirrors serialize_storage_object in lambda_function.py so both writers produce the same objects.
+    """
+    indent = app.config['STORAGE_JSON_INDENT']
+    if indent is None:
+        raw = orjson.dumps(storage_object) if orjson else json.dumps(storage_object, separators=(',', ':')).encode('utf-8')
+    else:
+        raw = json.dumps(storage_object, indent=indent).encode('utf-8')
+    
+    content_encoding = app.config['STORAGE_CONTENT_ENCODING']
+    if content_encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(raw), 'zstd'
+    if content_encoding in ('gzip', 'zstd'):
+        # zstd falls back to gzip when the zstandard package is not installed
+        return gzip.compress(raw, compresslevel=6), 'gzip'
+    return raw, 'identity'
+
+def decode_storage_body(body, content_encoding):
+    """Decode a stored document written with any supported encoding, sniffing the magic bytes when unlabelled"""
+    if content_encoding == 'gzip' or body[:2] == b'\x1f\x8b':
+        body = gzip.decompress(body)
+    elif content_encoding == 'zstd' or body[:4] == b'\x28\xb5\x2f\xfd':
+        body = zstandard.ZstdDecompressor().decompress(body)
+    return json.loads(body)
+
+def invoke_storage_lambda(lambda_payload):
+    """Invoke the storage Lambda synchronously; returns (status_code, decoded payload)"""
+    # Invoke Lambda function through the shared client
+    with timed_span("storage_lambda_invoke"), checkout_aws_client('lambda', LAMBDA_REGION) as lambda_client:
+        response = lambda_client.invoke(
+            FunctionName='aiws-lambda',  
+            InvocationType='RequestResponse',
+            Payload=json.dumps(lambda_payload)
+        )
         
-        # Ensure resources exist
-        topic.setdefault('resources', [])
+        # Parse Lambda response
+        response_payload = json.loads(response['Payload'].read().decode('utf-8'))
+    return response['StatusCode'], response_payload
+
+# Background writes for the async and batched storage modes
+storage_executor = None
+storage_executor_lock = threading.Lock()
+storage_metrics = {"queued": 0, "saved": 0, "failed": 0, "batches": 0}
+storage_metrics_lock = threading.Lock()
+
+def record_storage_metric(name, count=1):
+    with storage_metrics_lock:
+        storage_metrics[name] += count
+
+def get_storage_executor():
+    """Return the shared storage write pool, creating it if needed"""
+    global storage_executor
+    if storage_executor is None:
+        with storage_executor_lock:
+            if storage_executor is None:
+                storage_executor = ThreadPoolExecutor(
+                    max_workers=app.config['STORAGE_WRITE_WORKERS'],
+                    thread_name_prefix='storage'
+                )
+    return storage_executor
+
+# Individual S3 puts of a batch; sized like the AWS connection pool they share
+storage_put_executor = None
+storage_put_executor_lock = threading.Lock()
+
+def get_storage_put_executor():
+    """Return the pool for per-item writes within a batch, creating it if needed"""
+    global storage_put_executor
+    if storage_put_executor is None:
+        with storage_put_executor_lock:
+            if storage_put_executor is None:
+                storage_put_executor = ThreadPoolExecutor(
+                    max_workers=app.config['AWS_MAX_POOL_CONNECTIONS'],
+                    thread_name_prefix='storage-put'
+                )
+    return storage_put_executor
+
+def save_in_background(backend, items):
+    """Write items that the client has already been answered for; failures can only be logged"""
+    try:
+        with timed_span("storage_save", backend=app.config['STORAGE_BACKEND'], batch="true"):
+            outcomes = backend.save_many(items)
+    except Exception as e:
+        outcomes = [e] * len(items)
+    stored = [(item, outcome) for item, outcome in zip(items, outcomes) if not isinstance(outcome, Exception)]
+    failures = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    record_storage_metric("saved", len(stored))
+    if failures:
+        record_storage_metric("failed", len(failures))
+        print(f"Background storage of {len(failures)} of {len(items)} learning path(s) failed: {failures[0]}")
+    if stored:
+        with app.app_context():
+            index_learning_paths([item for item, _ in stored], [path_details for _, path_details in stored])
+
+def save_and_index(backend, item):
+    with timed_span("storage_save", backend=app.config['STORAGE_BACKEND'], batch="false"):
+        path_details = backend.save(item)
+    index_learning_paths([item], [path_details])
+    return path_details
+
+def index_learning_paths(items, saved):
+    """Record stored learning paths in the history index, given the backend's path details for each item"""
+    try:
+        for item, path_details in zip(items, saved):
+            learning_path = item['learning_path']
+            topics = learning_path.get('topics')
+            db.session.add(LearningPathIndex(
+                path_id=item['path_id'],
+                user_id=item['user_id'],
+                title=str(learning_path.get('title') or 'Untitled Learning Path')[:255],
+                topic_count=len(topics) if isinstance(topics, list) else 0,
+                size_bytes=path_details.get('size_bytes'),
+                storage_location=path_details['storage_location'],
+                created_at=datetime.fromisoformat(item['created_at'])
+            ))
+        db.session.commit()
+    except Exception as e:
+        # The paths are stored either way; they are only missing from the history listing
+        db.session.rollback()
+        print(f"Indexing of {len(items)} stored learning path(s) failed: {e}")
+
+def serialize_learning_path_index(entry):
+    return {
+        "path_id": entry.path_id,
+        "title": entry.title,
+        "topic_count": entry.topic_count,
+        "size_bytes": entry.size_bytes,
+        "storage_location": entry.storage_location,
+        "created_at": entry.created_at.isoformat()
+    }
+
+@app.route('/api/users/<user_id>/learning-paths', methods=['GET'])
+def get_learning_path_history(user_id):
+    """A user's stored learning paths, newest first, served from the index alone"""
+    return feed_response(
+        LearningPathIndex.query.filter_by(user_id=user_id),
+        LearningPathIndex.created_at, LearningPathIndex.id, serialize_learning_path_index
+    )
+
+@app.route('/api/users/<user_id>/learning-paths/<path_id>', methods=['GET'])
+def get_stored_learning_path(user_id, path_id):
+    entry = LearningPathIndex.query.filter_by(user_id=user_id, path_id=path_id).first()
+    if not entry:
+        return jsonify({"error": "Learning path not found"}), 404
+    try:
+        stored = get_storage_backend().load(user_id, path_id)
+    except (ClientError, OSError) as e:
+        print(f"Error loading learning path {path_id}: {str(e)}")
+        return jsonify({"error": "Stored learning path is unavailable"}), 502
+    return jsonify(stored)
+
+class StorageBatcher:
+    """Collects saves and writes them together, once STORAGE_BATCH_SIZE items are waiting
+    or STORAGE_BATCH_INTERVAL seconds after the first one arrived"""
+    
+    def __init__(self):
+        self.items = []
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name='storage-batcher', daemon=True)
+        self.thread.start()
+    
+    def add(self, item):
+        with self.condition:
+            self.items.append(item)
+            self.condition.notify()
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.items:
+                    self.condition.wait()
+                deadline = time.monotonic() + app.config['STORAGE_BATCH_INTERVAL']
+                while len(self.items) < app.config['STORAGE_BATCH_SIZE']:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self.items[:app.config['STORAGE_BATCH_SIZE']]
+                del self.items[:len(batch)]
+            record_storage_metric("batches")
+            with app.app_context():
+                save_in_background(get_storage_backend(), batch)
+    
+    def pending(self):
+        with self.condition:
+            return len(self.items)
+
+storage_batcher = None
+storage_batcher_lock = threading.Lock()
+
+def get_storage_batcher():
+    global storage_batcher
+    if storage_batcher is None:
+        with storage_batcher_lock:
+            if storage_batcher is None:
+                storage_batcher = StorageBatcher()
+    return storage_batcher
+
+def get_storage_metrics():
+    with storage_metrics_lock:
+        metrics = dict(storage_metrics)
+    metrics["backend"] = app.config['STORAGE_BACKEND']
+    metrics["write_mode"] = app.config['STORAGE_WRITE_MODE']
+    metrics["batch_pending"] = storage_batcher.pending() if storage_batcher else 0
+    return metrics
+
+
+# Add this function to your Flask app
+def escape_mermaid_label(text):
+    """Make text safe inside a quoted Mermaid label"""
+    return str(text).replace('"', '#quot;').replace('\n', ' ')
+
+@lru_cache(maxsize=app.config['FLOWCHART_FRAGMENT_CACHE_SIZE'])
+def topic_flowchart_fragment(index, name, duration, resource_count, project_count):
+    """Mermaid lines for one topic's nodes, memoized on the topic's content and position"""
+    topic_id = f"topic{index}"
+    return "".join([
+        f"    {topic_id}[\"{name}\"] --> {topic_id}_details\n",
+        f"    {topic_id}_details[\"Duration: {duration}\"] --> {topic_id}_resources\n",
+        f"    {topic_id}_resources{{{resource_count} Resources}}\n",
+        f"    {topic_id}_resources --> {topic_id}_projects\n",
+        f"    {topic_id}_projects{{{project_count} Projects}}\n"
+    ])
+
+class RoadmapFlowchart:
+    """Mermaid flowchart for a learning path, kept as sections so that editing one topic
+    only rebuilds that topic's lines"""
+    
+    def __init__(self, learning_path):
+        self.topics = list(learning_path.get('topics') or [])
         
-        # Ensure study plan exists
-        if not isinstance(topic.get('study_plan'), list):
-            topic['study_plan'] = [{
-                'day': 'Day 1',
-                'tasks': ['Study core concepts']
-            }]
+        # Title, overview and start nodes
+        title_text = escape_mermaid_label(learning_path.get('title', 'Learning Path'))
+        overview_text = escape_mermaid_label(learning_path.get('overview', 'Complete this learning path'))
+        header = [
+            "flowchart TD\n",
+            f"    title[\"{title_text}\"] --> overview\n",
+            f"    overview[\"Overview: {overview_text}\"] --> start\n",
+            "    start([\"Start Learning\"])\n"
+        ]
+        if self.topics:
+            header.append("    start --> topic0\n")
+        self.header = "".join(header)
         
-        # Validate projects
-        if not isinstance(topic.get('projects'), list):
-            topic['projects'] = [{
-                'name': 'Practical Application',
-                'description': 'Apply what you learned',
-                'complexity': 'intermediate'
-            }]
+        self.sections = [self.topic_section(i) for i in range(len(self.topics))]
+        
+        # Completion node and styling
+        total_duration = escape_mermaid_label(learning_path.get('total_duration', 'Several weeks'))
+        self.footer = "".join([
+            f"    complete([\"Complete! Total: {total_duration}\"])\n",
+            "    classDef topic fill:#f9f7ed,stroke:#333,stroke-width:1px;\n",
+            "    classDef milestone fill:#e8f4ea,stroke:#333,stroke-width:1px,stroke-dasharray: 5 5;\n",
+            "    class title,complete milestone;\n",
+            "    class " + ",".join([f"topic{i}" for i in range(len(self.topics))]) + " topic;\n"
+        ])
+    
+    def topic_section(self, index):
+        topic = self.topics[index]
+        if not isinstance(topic, dict):
+            topic = {}
+        fragment = topic_flowchart_fragment(
+            index,
+            escape_mermaid_label(topic.get('name', f'Topic {index+1}')),
+            escape_mermaid_label(topic.get('duration', '1 week')),
+            len(topic.get('resources', [])),
+            len(topic.get('projects', []))
+        )
+        # Connect to the next topic, or to the completion node after the last one
+        next_id = f"topic{index+1}" if index < len(self.topics) - 1 else "complete"
+        return f"{fragment}    topic{index}_projects --> {next_id}\n"
+    
+    def update_topic(self, index, topic):
+        """Replace one topic, rebuilding only its section"""
+        self.topics[index] = topic
+        self.sections[index] = self.topic_section(index)
+    
+    def render(self):
+        return "".join([self.header, *self.sections, self.footer])
+
+def generate_roadmap_flowchart(learning_path):
+    """Generate a Mermaid flowchart string based on the learning path"""
+    return RoadmapFlowchart(learning_path).render()
+
+class FlowchartRenderError(Exception):
+    """The Mermaid CLI failed to render a flowchart"""
+
+# Rendered SVGs are addressed by the SHA-256 of their Mermaid source, so an entry never goes stale
+# and identical flowcharts share one render. Sources and SVGs are kept under FLOWCHART_SVG_DIR,
+# which also lets every worker process serve flowcharts registered by the others. Only the
+# flowcharts someone actually fetches are rendered, and the directory is capped at
+# FLOWCHART_SVG_DIR_MAX_ENTRIES flowcharts.
+flowchart_svg_cache = TTLCache(app.config['FLOWCHART_SVG_CACHE_SIZE'], float('inf'))
+flowchart_renders = SingleFlight()
+flowchart_render_slots = threading.BoundedSemaphore(app.config['FLOWCHART_RENDER_WORKERS'])
+flowchart_sources_written = 0
+flowchart_sources_written_lock = threading.Lock()
+
+def flowchart_file(digest, extension):
+    return os.path.join(app.config['FLOWCHART_SVG_DIR'], f"{digest}.{extension}")
+
+def register_flowchart(mermaid_code):
+    """Keep a flowchart's source for the SVG endpoint, which renders it on first request; returns its URL"""
+    global flowchart_sources_written
+    digest = hashlib.sha256(mermaid_code.encode('utf-8')).hexdigest()
+    source_path = flowchart_file(digest, 'mmd')
+    try:
+        # Already registered: mark it recently used so pruning keeps it
+        os.utime(source_path)
+    except FileNotFoundError:
+        os.makedirs(app.config['FLOWCHART_SVG_DIR'], exist_ok=True)
+        temp_path = f"{source_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(mermaid_code)
+        os.replace(temp_path, source_path)
+        
+        # Check the directory size once per 1% of the limit in new flowcharts, not on every write
+        with flowchart_sources_written_lock:
+            flowchart_sources_written += 1
+            prune_due = flowchart_sources_written % max(1, app.config['FLOWCHART_SVG_DIR_MAX_ENTRIES'] // 100) == 0
+        if prune_due:
+            prune_flowchart_dir()
+    return f"/api/flowcharts/{digest}.svg"
+
+def prune_flowchart_dir():
+    """Delete the least recently generated flowcharts beyond FLOWCHART_SVG_DIR_MAX_ENTRIES"""
+    sources = []
+    for entry in os.scandir(app.config['FLOWCHART_SVG_DIR']):
+        if entry.name.endswith('.mmd'):
+            try:
+                sources.append((entry.stat().st_mtime, entry.name[:-len('.mmd')]))
+            except FileNotFoundError:
+                pass
+    excess = len(sources) - app.config['FLOWCHART_SVG_DIR_MAX_ENTRIES']
+    if excess <= 0:
+        return
+    # A pruned flowchart's URL answers 404 and clients render its Mermaid source themselves
+    for _, digest in sorted(sources)[:excess]:
+        for extension in ('mmd', 'svg'):
+            try:
+                os.remove(flowchart_file(digest, extension))
+            except FileNotFoundError:
+                pass
+
+def load_flowchart_svg(digest):
+    """Return the SVG for a registered flowchart, rendering it if needed; None if the digest is unknown"""
+    svg = flowchart_svg_cache.get(digest)
+    if svg is not None:
+        return svg
+    
+    # Concurrent requests for the same flowchart share one render
+    flight, is_leader = flowchart_renders.join(digest)
+    if not is_leader:
+        flight.done.wait()
+        if isinstance(flight.result, FlowchartRenderError):
+            raise flight.result
+        return flight.result
+    
+    result = None
+    try:
+        result = read_or_render_flowchart(digest)
+        if result is not None:
+            flowchart_svg_cache.put(digest, result)
+    except FlowchartRenderError as e:
+        result = e
+        raise
+    finally:
+        flowchart_renders.finish(digest, result)
+    return result
+
+def read_or_render_flowchart(digest):
+    svg_path = flowchart_file(digest, 'svg')
+    try:
+        with open(svg_path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    
+    source_path = flowchart_file(digest, 'mmd')
+    if not os.path.exists(source_path):
+        return None
+    
+    # The CLI picks its output format from the extension, so the temporary file keeps .svg
+    temp_path = flowchart_file(f"{digest}.{uuid.uuid4().hex}.tmp", 'svg')
+    try:
+        with flowchart_render_slots:
+            subprocess.run(
+                [app.config['FLOWCHART_RENDERER'], '-i', source_path, '-o', temp_path, '--quiet'],
+                check=True,
+                capture_output=True,
+                timeout=app.config['FLOWCHART_RENDER_TIMEOUT']
+            )
+        with open(temp_path, 'rb') as f:
+            svg = f.read()
+        os.replace(temp_path, svg_path)
+        return svg
+    except subprocess.CalledProcessError as e:
+        raise FlowchartRenderError(e.stderr.decode('utf-8', 'replace').strip() or str(e))
+    except (OSError, subprocess.SubprocessError) as e:
+        raise FlowchartRenderError(str(e))
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+@app.route('/api/flowcharts/<digest>.svg', methods=['GET'])
+def get_flowchart_svg(digest):
+    if not re.fullmatch(r'[0-9a-f]{64}', digest):
+        return jsonify({"error": "Flowchart not found"}), 404
+    
+    # The URL names the content, so the digest is a strong ETag and the response never changes
+    if request.if_none_match.contains(digest):
+        response = app.response_class(status=304)
+    else:
+        try:
+            svg = load_flowchart_svg(digest)
+        except FlowchartRenderError as e:
+            print(f"Flowchart render failed: {e}")
+            return jsonify({"error": "Flowchart could not be rendered"}), 502
+        if svg is None:
+            return jsonify({"error": "Flowchart not found"}), 404
+        response = app.response_class(svg, mimetype='image/svg+xml')
+    response.set_etag(digest)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+def build_learning_path_response(learning_path):
+    """Validate the learning path and build the response payload, including the flowchart"""
+    with timed_span("validation"):
+        learning_path, failed_fields = validate_learning_path(learning_path)
     
     # Generate roadmap flowchart
-    roadmap_flowchart = generate_roadmap_flowchart(learning_path)
-    print(f"Generated flowchart: {roadmap_flowchart}")
+    with timed_span("flowchart"):
+        roadmap_flowchart = generate_roadmap_flowchart(learning_path)
+    log_sampled("Generated flowchart: %s", roadmap_flowchart)
     
-    return jsonify({
+    response = {
         "status": "success",
         "learning_path": learning_path,
-        "roadmap_flowchart": roadmap_flowchart
-    })
+        "roadmap_flowchart": roadmap_flowchart,
+        "failed_fields": failed_fields  # Fields that were invalid and fell back to defaults
+    }
+    if app.config['FLOWCHART_SVG_RENDERING']:
+        try:
+            response["roadmap_svg_url"] = register_flowchart(roadmap_flowchart)
+        except OSError as e:
+            # Clients fall back to rendering the Mermaid source themselves
+            print(f"Could not register flowchart for rendering: {e}")
+    return response
 
 
 # Call the function to create tables
 if __name__ == '__main__':
     create_tables()  # Create tables before running the app
+    resume_learning_path_jobs()
     app.run(debug=True)
@@ -0,0 +1,101 @@
+"""Load test for register/profile throughput under concurrent writers.
+
+Runs the Flask app in-process against a scratch database (a temporary SQLite
+file by default, or any SQLAlchemy URL passed with --database-url) and drives
+/api/register and then /api/profile/<id> from a pool of writer threads. The two
+phases are timed separately, so each req/s figure is that endpoint's own
+throughput.
+
+    python benchmarks/db_load_test.py --writers 16 --users 400
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(name, latencies, errors, elapsed):
+    if not latencies:
+        print(f"{name:<10} no successful requests, {errors} errors")
+        return
+    print(
+        f"{name:<10} {len(latencies):>6} ok {errors:>4} err  "
+        f"{len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+        f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=8, help='concurrent client threads')
+    parser.add_argument('--users', type=int, default=200, help='users registered during the run')
+    parser.add_argument('--profile-reads', type=int, default=5, help='profile requests per registered user')
+    parser.add_argument('--database-url', help='SQLAlchemy URL to test instead of a scratch SQLite file')
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix='aiws-db-load-')
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(scratch_dir, 'load.db')}"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as backend
+
+    backend.create_tables()
+    client_local = threading.local()
+    run_id = int(time.time())
+    results = {"register": [], "profile": []}
+    errors = {"register": 0, "profile": 0}
+    lock = threading.Lock()
+
+    def client():
+        if not hasattr(client_local, 'client'):
+            client_local.client = backend.app.test_client()
+        return client_local.client
+
+    def timed(name, send):
+        start = time.perf_counter()
+        response = send()
+        elapsed = time.perf_counter() - start
+        with lock:
+            if response.status_code < 400:
+                results[name].append(elapsed)
+            else:
+                errors[name] += 1
+        return response
+
+    def register(n):
+        response = timed('register', lambda: client().post('/api/register', json={
+            'username': f'load-{run_id}-{n}',
+            'password': 'load-test-password',
+            'email': f'load-{run_id}-{n}@example.com'
+        }))
+        return response.get_json()['user_id'] if response.status_code == 201 else None
+
+    def read_profile(user_id):
+        timed('profile', lambda: client().get(f'/api/profile/{user_id}'))
+
+    def run_phase(name, work, items):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.writers) as executor:
+            outcomes = list(executor.map(work, items))
+        report(name, results[name], errors[name], time.perf_counter() - start)
+        return outcomes
+
+    print(f"database: {backend.app.config['SQLALCHEMY_DATABASE_URI']}")
+    print(f"writers: {args.writers}, users: {args.users}, profile reads per user: {args.profile_reads}")
+    user_ids = [user_id for user_id in run_phase('register', register, range(args.users)) if user_id is not None]
+    run_phase('profile', read_profile, [user_id for user_id in user_ids for _ in range(args.profile_reads)])
+    print(f"pool: {backend.get_database_pool_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark for roadmap flowchart generation on large learning paths.
+
+Times a cold build (empty fragment cache), a rebuild of an unchanged path
+(every topic fragment memoized), and an incremental update of a single edited
+topic, for paths of each requested size.
+
+    python benchmarks/flowchart_benchmark.py --topics 100 500 2000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+
+def make_learning_path(topic_count):
+    return {
+        'title': f'Imported "Curriculum" with {topic_count} topics',
+        'overview': 'A large curriculum import',
+        'total_duration': f'{topic_count} weeks',
+        'topics': [
+            {
+                'name': f'Topic {i}: "Module" {i}',
+                'duration': f'{i % 4 + 1} weeks',
+                'resources': [{'title': f'Resource {j}'} for j in range(i % 5 + 1)],
+                'projects': [{'name': f'Project {j}'} for j in range(i % 3)]
+            }
+            for i in range(topic_count)
+        ]
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--topics', type=int, nargs='+', default=[100, 500, 2000], help='path sizes to benchmark')
+    parser.add_argument('--repeat', type=int, default=20, help='runs per measurement (median is reported)')
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as backend
+
+    for topic_count in args.topics:
+        learning_path = make_learning_path(topic_count)
+
+        def cold_build():
+            backend.topic_flowchart_fragment.cache_clear()
+            backend.generate_roadmap_flowchart(learning_path)
+
+        flowchart = backend.RoadmapFlowchart(learning_path)
+        edited = dict(learning_path['topics'][topic_count // 2], duration='6 weeks')
+
+        def incremental_update():
+            flowchart.update_topic(topic_count // 2, edited)
+            flowchart.render()
+
+        cold = timed(cold_build, args.repeat)
+        warm = timed(lambda: backend.generate_roadmap_flowchart(learning_path), args.repeat)
+        incremental = timed(incremental_update, args.repeat)
+        size = len(backend.generate_roadmap_flowchart(learning_path))
+        print(
+            f"{topic_count:>6} topics  {size / 1024:8.1f} KiB  "
+            f"cold {cold:8.2f} ms  memoized {warm:8.2f} ms  one topic edited {incremental:8.3f} ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""Offline end-to-end benchmark with local fakes for Bedrock, Lambda and S3.
+
+Replaces boto3's clients with in-process fakes that add configurable latency,
+inject service errors and return malformed JSON at a chosen rate, then drives
+the Flask app in-process (against a scratch database) through
+/api/generate-learning-path, /api/save-learning-path, /api/profile/<id> and
+/api/login at a fixed concurrency. Needs no network or AWS credentials, so it
+can run on any Linux box before a deploy.
+
+    python benchmarks/offline_benchmark.py --concurrency 16 --requests 200
+    python benchmarks/offline_benchmark.py --endpoints generate --malformed-rate 0.2 --error-rate 0.05
+
+The storage Lambda is exercised through the real lambda_function handler, with
+its S3 client replaced by the same fake.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.exceptions import ClientError
+
+from db_load_test import report
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_ROOT = os.path.dirname(os.path.dirname(BACKEND_DIR))
+ENDPOINTS = ('generate', 'save', 'profile', 'login')
+
+
+class FakeService:
+    """Shared latency, error injection and call counting for the fakes"""
+
+    def __init__(self, name, latency, error_rate, seed):
+        self.name = name
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def call(self, operation):
+        with self.lock:
+            self.calls += 1
+            fail = self.random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        time.sleep(self.latency)
+        if fail:
+            raise ClientError(
+                {'Error': {'Code': 'ServiceUnavailableException', 'Message': f'Injected {self.name} error'}},
+                operation
+            )
+
+    def chance(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+
+def fake_topic_details(index):
+    return {
+        'resources': [
+            {'type': 'video', 'title': f'Video {index}', 'url': f'https://www.youtube.com/watch?v=vid{index}&t=30', 'estimated_time': '20 min'},
+            {'type': 'article', 'title': f'Article {index}', 'url': f'https://example.com/article/{index}', 'estimated_time': '15 min'}
+        ],
+        'projects': [{'name': f'Project {index}', 'description': 'Build something small', 'complexity': 'beginner'}],
+        'study_plan': [{'day': 'Day 1', 'tasks': ['Read the article']}, {'day': 'Day 2', 'tasks': ['Build the project']}]
+    }
+
+
+def malform(text, rng):
+    """Damage JSON the way models do: surrounding prose, truncation, or text that only a model can repair"""
+    kind = rng.choice(('prose', 'truncated', 'unrepairable'))
+    if kind == 'prose':
+        return f"Here is the JSON you asked for:\n{text}\nLet me know if you need anything else."
+    if kind == 'truncated':
+        return text[:max(1, int(len(text) * 0.8))]
+    return "I could not produce the requested structure."
+
+
+class FakeBedrockRuntime:
+    def __init__(self, service, malformed_rate, topic_count):
+        self.service = service
+        self.malformed_rate = malformed_rate
+        self.topic_count = topic_count
+
+    def answer(self, request_body):
+        """Pick a plausible answer for whichever prompt template the request was built from"""
+        system_prompt = request_body.get('system', '')
+        user_message = request_body['messages'][0]['content']
+        if 'fix malformed JSON' in system_prompt:
+            # Only text that local repair gave up on gets here, and there is nothing left to recover from it
+            return '{}'
+        if 'for each topic in' in system_prompt:
+            names = json.loads(system_prompt.split('for each topic in ', 1)[1].split(', with this structure', 1)[0])
+            text = json.dumps({'topics': [dict(name=name, **fake_topic_details(i)) for i, name in enumerate(names)]})
+        elif '"resources"' in system_prompt:
+            text = json.dumps(fake_topic_details(len(user_message) % 7))
+        else:
+            subject = user_message.split('learning path for: ', 1)[-1].split('. Focus on', 1)[0]
+            text = json.dumps(self.basic_path(subject))
+        if self.service.chance(self.malformed_rate):
+            with self.service.lock:
+                text = malform(text, self.service.random)
+        return text
+
+    def basic_path(self, subject):
+        # Topic names carry the subject, so distinct prompts do not share cached topic enrichments
+        return {
+            'title': f'Learning path for {subject}',
+            'overview': 'A short overview of the path',
+            'total_duration': f'{self.topic_count} weeks',
+            'topics': [
+                {'name': f'Topic {i} of {subject}', 'duration': '1 week', 'description': 'What this topic covers'}
+                for i in range(self.topic_count)
+            ]
+        }
+
+    def invoke_model(self, modelId, body):
+        self.service.call('InvokeModel')
+        text = self.answer(json.loads(body))
+        return {'body': io.BytesIO(json.dumps({
+            'content': [{'type': 'text', 'text': text}],
+            'stop_reason': 'end_turn',
+            'usage': {'input_tokens': len(body) // 4, 'output_tokens': len(text) // 4}
+        }).encode('utf-8'))}
+
+    def invoke_model_with_response_stream(self, modelId, body):
+        self.service.call('InvokeModelWithResponseStream')
+        text = self.answer(json.loads(body))
+
+        def events():
+            yield {'chunk': {'bytes': json.dumps({'type': 'message_start', 'message': {'usage': {'input_tokens': len(body) // 4}}}).encode('utf-8')}}
+            for start in range(0, len(text), 40):
+                yield {'chunk': {'bytes': json.dumps({'type': 'content_block_delta', 'delta': {'type': 'text_delta', 'text': text[start:start + 40]}}).encode('utf-8')}}
+            yield {'chunk': {'bytes': json.dumps({'type': 'message_delta', 'delta': {'stop_reason': 'end_turn'}, 'usage': {'output_tokens': len(text) // 4}}).encode('utf-8')}}
+
+        return {'body': events()}
+
+
+class FakeS3:
+    def __init__(self, service):
+        self.service = service
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.service.call('PutObject')
+        self.objects[(Bucket, Key)] = (Body, kwargs)
+        return {'ETag': '"fake"'}
+
+    def get_object(self, Bucket, Key):
+        self.service.call('GetObject')
+        body, kwargs = self.objects[(Bucket, Key)]
+        return {
+            'Body': io.BytesIO(body if isinstance(body, bytes) else body.encode('utf-8')),
+            'ContentEncoding': kwargs.get('ContentEncoding'),
+            'Metadata': kwargs.get('Metadata', {})
+        }
+
+
+class FakeLambda:
+    """Runs the real storage handler from lambda_function.py in-process"""
+
+    def __init__(self, service, s3):
+        self.service = service
+        sys.path.insert(0, REPO_ROOT)
+        import lambda_function
+        lambda_function.s3_client = s3
+        self.handler = lambda_function.lambda_handler
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        self.service.call('Invoke')
+        result = self.handler(json.loads(Payload), None)
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(result).encode('utf-8'))}
+
+
+def install_fakes(args):
+    services = {
+        'bedrock-runtime': FakeService('bedrock', args.bedrock_latency / 1000, args.error_rate, args.seed),
+        'lambda': FakeService('lambda', args.lambda_latency / 1000, args.error_rate, args.seed + 1),
+        's3': FakeService('s3', args.s3_latency / 1000, args.error_rate, args.seed + 2)
+    }
+    s3 = FakeS3(services['s3'])
+    clients = {
+        'bedrock-runtime': FakeBedrockRuntime(services['bedrock-runtime'], args.malformed_rate, args.topics),
+        'lambda': FakeLambda(services['lambda'], s3),
+        's3': s3
+    }
+    # The app creates its clients through boto3.client, so handing out the fakes there covers every call site
+    boto3.client = lambda service_name, *a, **kw: clients[service_name]
+    return services
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS), help='endpoints to drive, in order')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent client threads')
+    parser.add_argument('--requests', type=int, default=100, help='requests per endpoint')
+    parser.add_argument('--users', type=int, default=8, help='users registered up front for profile and login')
+    parser.add_argument('--distinct-prompts', type=int, default=0, help='cycle through this many prompts (0: every prompt is new)')
+    parser.add_argument('--topics', type=int, default=4, help='topics in each generated path')
+    parser.add_argument('--bedrock-latency', type=float, default=300, help='fake Bedrock latency in ms')
+    parser.add_argument('--lambda-latency', type=float, default=30, help='fake Lambda latency in ms')
+    parser.add_argument('--s3-latency', type=float, default=20, help='fake S3 latency in ms')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of fake AWS calls that fail')
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='fraction of model answers with broken JSON')
+    parser.add_argument('--streaming', action='store_true', help='generate through the Bedrock response stream')
+    parser.add_argument('--enrichment-mode', choices=('per_topic', 'batched'), default='per_topic')
+    parser.add_argument('--storage-backend', choices=('lambda', 's3', 'local'), default='lambda')
+    parser.add_argument('--storage-write-mode', choices=('sync', 'async', 'batched'), default='sync')
+    parser.add_argument('--keep-rate-limits', action='store_true', help='keep the configured Bedrock rate limits')
+    parser.add_argument('--seed', type=int, default=1, help='seed for injected errors and malformed answers')
+    parser.add_argument('--database-url', help='SQLAlchemy URL to test instead of a scratch SQLite file')
+    args = parser.parse_args()
+
+    scratch_dir = tempfile.mkdtemp(prefix='aiws-offline-bench-')
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(scratch_dir, 'bench.db')}"
+    services = install_fakes(args)
+    sys.path.insert(0, BACKEND_DIR)
+    import app as backend
+
+    backend.app.config.update(
+        BEDROCK_STREAMING=args.streaming,
+        ENRICHMENT_MODE=args.enrichment_mode,
+        STORAGE_BACKEND=args.storage_backend,
+        STORAGE_WRITE_MODE=args.storage_write_mode,
+        STORAGE_LOCAL_DIR=os.path.join(scratch_dir, 'learning-paths'),
+        FLOWCHART_SVG_DIR=os.path.join(scratch_dir, 'flowcharts')
+    )
+    if not args.keep_rate_limits:
+        backend.app.config['BEDROCK_RATE_LIMITS'] = {}
+    backend.create_tables()
+
+    client_local = threading.local()
+    run_id = int(time.time())
+
+    def client():
+        if not hasattr(client_local, 'client'):
+            client_local.client = backend.app.test_client()
+        return client_local.client
+
+    # Users for the profile and login phases; registration itself is covered by db_load_test.py
+    users = []
+    for n in range(args.users):
+        response = client().post('/api/register', json={
+            'username': f'bench-{run_id}-{n}',
+            'password': 'bench-password',
+            'email': f'bench-{run_id}-{n}@example.com'
+        })
+        users.append((response.get_json()['user_id'], f'bench-{run_id}-{n}'))
+
+    def prompt(n):
+        key = n % args.distinct_prompts if args.distinct_prompts else n
+        return f'benchmark topic {run_id}-{key}'
+
+    sample_path = {
+        'title': 'Benchmark path',
+        'topics': [dict(name=f'Topic {i}', duration='1 week', **fake_topic_details(i)) for i in range(args.topics)]
+    }
+    senders = {
+        'generate': lambda n: client().post('/api/generate-learning-path', json={'prompt': prompt(n)}),
+        'save': lambda n: client().post('/api/save-learning-path', json={'learning_path': sample_path, 'userId': f'bench-{n % max(1, args.users)}'}),
+        'profile': lambda n: client().get(f'/api/profile/{users[n % len(users)][0]}'),
+        'login': lambda n: client().post('/api/login', json={'username': users[n % len(users)][1], 'password': 'bench-password'})
+    }
+
+    print(f"database: {backend.app.config['SQLALCHEMY_DATABASE_URI']}")
+    print(
+        f"concurrency: {args.concurrency}, requests per endpoint: {args.requests}, "
+        f"latency bedrock/lambda/s3: {args.bedrock_latency:g}/{args.lambda_latency:g}/{args.s3_latency:g} ms, "
+        f"error rate: {args.error_rate:g}, malformed rate: {args.malformed_rate:g}"
+    )
+    for name in args.endpoints:
+        if name in ('profile', 'login') and not users:
+            print(f"{name:<10} skipped, needs --users")
+            continue
+        latencies = []
+        errors = 0
+        lock = threading.Lock()
+
+        def timed(n):
+            nonlocal errors
+            start = time.perf_counter()
+            response = senders[name](n)
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code < 400:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(timed, range(args.requests)))
+        report(name, latencies, errors, time.perf_counter() - start)
+
+    # Async and batched saves are answered before they are written; let them finish before counting calls
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        storage = backend.get_storage_metrics()
+        if storage['saved'] + storage['failed'] >= storage['queued']:
+            break
+        time.sleep(0.1)
+
+    print("fake calls: " + ", ".join(
+        f"{service.name} {service.calls} ({service.errors} failed)" for service in services.values()
+    ))
+    print(f"json parse: {dict(backend.json_parse_metrics)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+"""gunicorn settings for serving the backend; gunicorn loads this file from the directory it starts in."""
+import os
+import subprocess
+import sys
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', os.cpu_count() or 1))
+# gevent runs each request on a greenlet and patches sockets, so a request waiting on
+# Bedrock, Lambda or S3 yields to the others instead of pinning an OS thread.
+# 'gthread' (thread per request, THREADS per worker) is the fallback without gevent.
+worker_class = os.environ.get('WORKER_CLASS', 'gevent')
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))  # Concurrent requests per gevent worker
+threads = int(os.environ.get('THREADS', 16))
+timeout = 120  # Above the longest generation; streaming responses hold their request for all of it
+
+
+def on_starting(server):
+    """Create the schema once, before any worker is forked.
+
+    Workers starting together would otherwise race each other's check-then-create.
+    It runs in a child process so the arbiter never imports the app, and workers
+    still load it fresh after the fork.
+    """
+    subprocess.run(
+        [sys.executable, '-c', 'from app import create_tables; create_tables()'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True
+    )
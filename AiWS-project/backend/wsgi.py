@@ -0,0 +1,20 @@
+"""WSGI entry point for production serving.
+
+gunicorn.conf.py serves the app from several worker processes using gevent
+workers. Each request runs on a greenlet, and sockets are patched, so a request
+waiting on Bedrock, Lambda or S3 yields to the others rather than holding an OS
+thread. The enrichment, job and storage pools run on greenlets as well. Only
+password hashing leaves the worker, to its forkserver process pool.
+
+    gunicorn wsgi:app
+    WEB_CONCURRENCY=4 PORT=5000 gunicorn wsgi:app
+
+WORKER_CLASS=gthread switches to one OS thread per request (THREADS per worker).
+
+Tables are created once by the on_starting hook in gunicorn.conf.py, before the
+workers fork; under any other server, run create_tables() before loading this module.
+"""
+from app import app, resume_learning_path_jobs
+
+# Every worker picks up unfinished jobs; claiming a job is atomic, so each runs once
+resume_learning_path_jobs()
@@ -17,6 +17,7 @@ function Home({ user, logout }) {
   const [showRawResponse, setShowRawResponse] = useState(false);
   const [errorResponse, setErrorResponse] = useState(null);
   const [roadmapFlowchart, setRoadmapFlowchart] = useState('');
+  const [roadmapSvgUrl, setRoadmapSvgUrl] = useState('');
   
   const containerAnimation = useSpring({
     from: { opacity: 0, y: 20 },
@@ -40,10 +41,10 @@ function Home({ user, logout }) {
 
   // Re-render mermaid diagrams when they change
   useEffect(() => {
-    if (roadmapFlowchart) {
+    if (roadmapFlowchart && !roadmapSvgUrl) {
       mermaid.contentLoaded();
     }
-  }, [roadmapFlowchart]);
+  }, [roadmapFlowchart, roadmapSvgUrl]);
 
 
   
@@ -59,6 +60,7 @@ function Home({ user, logout }) {
     setLearningPath(null);
     setErrorResponse(null);
     setRoadmapFlowchart('');
+    setRoadmapSvgUrl('');
     
     try {
       const response = await axios.post('http://localhost:5000/api/generate-learning-path', { 
@@ -74,6 +76,10 @@ function Home({ user, logout }) {
         if (response.data.roadmap_flowchart) {
           setRoadmapFlowchart(response.data.roadmap_flowchart);
         }
+        // Use the server-rendered SVG when the backend provides one
+        if (response.data.roadmap_svg_url) {
+          setRoadmapSvgUrl(`http://localhost:5000${response.data.roadmap_svg_url}`);
+        }
       } else {
         // Handle different error cases
         if (response.data.raw_response) {
@@ -229,9 +235,17 @@ function Home({ user, logout }) {
               <div className="roadmap-section">
                 <h3>Learning Path Roadmap</h3>
                 <div className="roadmap-container">
-                  <div className="mermaid">
-                    {roadmapFlowchart}
-                  </div>
+                  {roadmapSvgUrl ? (
+                    <img
+                      src={roadmapSvgUrl}
+                      alt="Learning path roadmap"
+                      onError={() => setRoadmapSvgUrl('')}
+                    />
+                  ) : (
+                    <div className="mermaid">
+                      {roadmapFlowchart}
+                    </div>
+                  )}
                 </div>
               </div>
             )}
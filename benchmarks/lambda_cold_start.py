@@ -0,0 +1,131 @@
+"""Cold versus warm invocation benchmark for lambda_function.lambda_handler.
+
+Serves a stub S3 over HTTP on localhost and points the real boto3 stack at it
+through AWS_ENDPOINT_URL_S3, so client construction, signing and the HTTP
+round trip are all measured while nothing leaves the machine. Each cold run is
+a fresh interpreter, the way a new Lambda execution environment starts:
+
+    module import   loading lambda_function (the init phase)
+    first call      the first invocation, which creates the shared S3 client
+    warm call       later single-item invocations in the same environment
+    batch call      one invocation carrying --batch learning paths
+
+    python benchmarks/lambda_cold_start.py --cold-runs 5 --warm 50 --batch 25
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def sample_learning_path(topics=8):
+    return {
+        'title': 'Benchmark Learning Path',
+        'description': 'Synthetic path used to time storage writes',
+        'topics': [
+            {
+                'name': f'Topic {i}',
+                'description': 'A topic description of realistic length. ' * 4,
+                'subtopics': [f'Subtopic {i}.{j}' for j in range(5)],
+                'resources': [{'title': f'Resource {j}', 'url': f'https://example.com/{i}/{j}'} for j in range(3)],
+                'estimated_duration': '2 weeks'
+            }
+            for i in range(topics)
+        ]
+    }
+
+
+def make_stub_s3(latency):
+    class StubS3Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps connections alive and answers botocore's Expect: 100-continue
+        # straight away, instead of leaving it to wait out its one second timeout
+        protocol_version = 'HTTP/1.1'
+
+        def do_PUT(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('ETag', '"stub"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    return StubS3Handler
+
+
+def run_worker(args):
+    """Runs inside a fresh interpreter and prints its timings as JSON"""
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    import lambda_function
+    import_time = time.perf_counter() - started
+
+    def invoke(body):
+        started = time.perf_counter()
+        response = lambda_function.lambda_handler({'body': body}, None)
+        if response['statusCode'] != 200 or json.loads(response['body'])['status'] != 'success':
+            raise RuntimeError(response['body'])
+        return time.perf_counter() - started
+
+    learning_path = sample_learning_path()
+    first_call = invoke({'learning_path': learning_path, 'user_id': 'bench'})
+    warm_calls = [invoke({'learning_path': learning_path, 'user_id': 'bench'}) for _ in range(args.warm)]
+    batch_call = invoke({'learning_paths': [{'learning_path': learning_path, 'user_id': 'bench'} for _ in range(args.batch)]})
+    print(json.dumps({'import': import_time, 'first': first_call, 'warm': warm_calls, 'batch': batch_call}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cold-runs', type=int, default=5, help='fresh interpreters to start')
+    parser.add_argument('--warm', type=int, default=50, help='warm single-item invocations per run')
+    parser.add_argument('--batch', type=int, default=25, help='learning paths in the batch invocation')
+    parser.add_argument('--s3-latency', type=float, default=20, help='stub S3 response delay in ms')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_stub_s3(args.s3_latency / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = dict(
+        os.environ,
+        AWS_ENDPOINT_URL_S3=f'http://127.0.0.1:{server.server_port}',
+        AWS_ACCESS_KEY_ID='benchmark',
+        AWS_SECRET_ACCESS_KEY='benchmark',
+        AWS_DEFAULT_REGION='ap-southeast-2',
+        AWS_EC2_METADATA_DISABLED='true'
+    )
+
+    runs = []
+    for _ in range(args.cold_runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--worker', '--warm', str(args.warm), '--batch', str(args.batch)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    server.shutdown()
+
+    warm = [sample for run in runs for sample in run['warm']]
+    batch = [run['batch'] for run in runs]
+    print(f"module import  {statistics.median(run['import'] for run in runs) * 1000:8.1f} ms  (median of {len(runs)} cold starts)")
+    print(f"first call     {statistics.median(run['first'] for run in runs) * 1000:8.1f} ms")
+    print(f"warm call      {statistics.median(warm) * 1000:8.1f} ms  (median of {len(warm)})")
+    print(
+        f"batch call     {statistics.median(batch) * 1000:8.1f} ms  for {args.batch} paths, "
+        f"{statistics.median(batch) / args.batch * 1000:.1f} ms per path"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,66 +1,166 @@
+import gzip
+import importlib
 import json
-import boto3
+import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# boto3 and the optional encoders are imported on first use rather than at module load,
+# so a cold start only pays for what the invocation actually touches.
+
+STORAGE_BUCKET = os.environ.get('STORAGE_BUCKET', 'aiws-challange-bucket')
+STORAGE_WRITE_WORKERS = int(os.environ.get('STORAGE_WRITE_WORKERS', '8'))  # Concurrent puts for a batch
+
+# Storage format for complete_data.json, configurable through the function's environment.
+# STORAGE_CONTENT_ENCODING: 'gzip' (default), 'zstd' (needs zstandard) or 'identity'
+# STORAGE_JSON_INDENT: indent width for pretty-printed JSON; unset for compact output
+STORAGE_CONTENT_ENCODING = os.environ.get('STORAGE_CONTENT_ENCODING', 'gzip')
+STORAGE_JSON_INDENT = int(os.environ['STORAGE_JSON_INDENT']) if os.environ.get('STORAGE_JSON_INDENT') else None
+
+# Reused across warm invocations of the same execution environment
+s3_client = None
+write_executor = None
+optional_modules = {}
+
+def get_s3_client():
+    """The S3 client, created on first use and kept for later invocations"""
+    global s3_client
+    if s3_client is None:
+        import boto3
+        from botocore.config import Config
+        s3_client = boto3.client('s3', config=Config(max_pool_connections=STORAGE_WRITE_WORKERS))
+    return s3_client
+
+def get_write_executor():
+    global write_executor
+    if write_executor is None:
+        write_executor = ThreadPoolExecutor(max_workers=STORAGE_WRITE_WORKERS)
+    return write_executor
+
+def optional_module(name):
+    """Import an optional package on first use; None when it is not bundled with the function"""
+    if name not in optional_modules:
+        try:
+            optional_modules[name] = importlib.import_module(name)
+        except ImportError:
+            optional_modules[name] = None
+    return optional_modules[name]
+
+def serialize_storage_object(storage_object):
+    """Encode the storage object for S3; returns (body bytes, content encoding)"""
+    orjson = optional_module('orjson')  # Faster encoder, used for compact output when available
+    if STORAGE_JSON_INDENT is None:
+        raw = orjson.dumps(storage_object) if orjson else json.dumps(storage_object, separators=(',', ':')).encode('utf-8')
+    else:
+        raw = json.dumps(storage_object, indent=STORAGE_JSON_INDENT).encode('utf-8')
+    
+    zstandard = optional_module('zstandard') if STORAGE_CONTENT_ENCODING == 'zstd' else None
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(raw), 'zstd'
+    if STORAGE_CONTENT_ENCODING in ('gzip', 'zstd'):
+        # zstd falls back to gzip when the zstandard package is not bundled
+        return gzip.compress(raw, compresslevel=6), 'gzip'
+    return raw, 'identity'
+
+def store_learning_path(body):
+    """Write one learning path to S3 and return its path details"""
+    learning_path = body.get('learning_path')
+    user_id = body.get('user_id', 'anonymous')
+    
+    # Validate required inputs
+    if not learning_path:
+        raise ValueError('No learning path data provided')
+    
+    # Use the caller's ID when given, otherwise generate a unique ID for this learning path
+    path_id = body.get('path_id') or str(uuid.uuid4())
+    timestamp = body.get('created_at') or datetime.utcnow().isoformat()
+    
+    # Prepare metadata
+    metadata = {
+        'path_id': path_id,
+        'created_at': timestamp,
+        'user_id': user_id,
+        'title': learning_path.get('title', 'Untitled Learning Path')
+    }
+    
+    # Create the complete storage object with metadata
+    storage_object = {
+        'metadata': metadata,
+        'learning_path': learning_path,
+    }
+    
+    # Store the complete data JSON, compacted and compressed as configured
+    data, content_encoding = serialize_storage_object(storage_object)
+    put_args = {
+        'Bucket': STORAGE_BUCKET,
+        'Key': f'learning-paths/{user_id}/{path_id}/complete_data.json',
+        'Body': data,
+        'ContentType': 'application/json',
+        'Metadata': {'content-encoding': content_encoding}
+    }
+    if content_encoding != 'identity':
+        put_args['ContentEncoding'] = content_encoding
+    get_s3_client().put_object(**put_args)
+    
+    return {
+        'path_id': path_id,
+        'storage_location': f's3://{STORAGE_BUCKET}/learning-paths/{user_id}/{path_id}/',
+        'created_at': timestamp,
+        'size_bytes': len(data)
+    }
+
+def store_learning_path_result(body):
+    """Per-item result for a batch, so one bad item doesn't fail the rest"""
+    try:
+        return {'status': 'success', 'path_details': store_learning_path(body)}
+    except Exception as e:
+        print(f"Error storing learning path {body.get('path_id')}: {str(e)}")
+        return {'status': 'error', 'path_id': body.get('path_id'), 'error': str(e)}
+
 def lambda_handler(event, context):
     """
     Lambda function to store learning path data and mermaid flowcharts in S3.
     
     Parameters:
-    - event: The event data containing:
+    - event: The event data containing either a single learning path:
         - learning_path: Complete learning path JSON from Bedrock
         - mermaid_code: Mermaid flowchart code 
         - user_id: Optional user ID
+        - path_id: Optional ID assigned by the caller (generated here if missing)
+        - created_at: Optional ISO timestamp assigned by the caller
+      or a batch of them:
+        - learning_paths: List of objects with the fields above, written concurrently
     - context: Lambda context
     
     Returns:
-    - Response with status and storage information
+    - Response with status and storage information (per item for a batch)
     """
     try:
         # Parse input from the event
         body = json.loads(event['body']) if isinstance(event.get('body'), str) else event.get('body', {})
         
-        learning_path = body.get('learning_path')
-        mermaid_code = body.get('mermaid_code')
-        user_id = body.get('user_id', 'anonymous')
+        if 'learning_paths' in body:
+            items = body['learning_paths']
+            get_s3_client()  # Create the shared client before the writer threads need it
+            results = list(get_write_executor().map(store_learning_path_result, items))
+            failed = sum(1 for result in results if result['status'] != 'success')
+            return {
+                'statusCode': 200,
+                'body': json.dumps({
+                    'status': 'success' if not failed else 'partial',
+                    'message': f'Stored {len(results) - failed} of {len(results)} learning paths',
+                    'results': results
+                })
+            }
         
-        # Validate required inputs
-        if not learning_path:
+        try:
+            path_details = store_learning_path(body)
+        except ValueError as e:
             return {
                 'statusCode': 400,
-                'body': json.dumps({'error': 'No learning path data provided'})
+                'body': json.dumps({'error': str(e)})
             }
-        
-        # Generate a unique ID for this learning path
-        path_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
-        
-        # Prepare metadata
-        metadata = {
-            'path_id': path_id,
-            'created_at': timestamp,
-            'user_id': user_id,
-            'title': learning_path.get('title', 'Untitled Learning Path')
-        }
-        
-        # Initialize S3 client
-        s3 = boto3.client('s3')
-        bucket_name = 'aiws-challange-bucket'
-        
-        # Create the complete storage object with metadata
-        storage_object = {
-            'metadata': metadata,
-            'learning_path': learning_path,
-        }
-        
-        # Store the complete data JSON
-        s3.put_object(
-            Bucket=bucket_name,
-            Key=f'learning-paths/{user_id}/{path_id}/complete_data.json',
-            Body=json.dumps(storage_object, indent=2),
-            ContentType='application/json'
-        )
                 
         # Return success response with path details
         return {
@@ -68,11 +168,7 @@ def lambda_handler(event, context):
             'body': json.dumps({
                 'status': 'success',
                 'message': 'Learning path stored successfully',
-                'path_details': {
-                    'path_id': path_id,
-                    'storage_location': f's3://{bucket_name}/learning-paths/{user_id}/{path_id}/',
-                    'created_at': timestamp
-                }
+                'path_details': path_details
             })
         }
         